@@ -1,7 +1,10 @@
-from .mp_functions import print_exception, is_parent_process_alive, mark_task_done, LoopQueueSize, \
-    stop_event_loop, run_loop, process_event, run_event_loop, run_consumer_loop, QUEUE_TIMEOUT
-from .events import Event, CacheEvent, CacheObjectEvent, SaveVarEvent, VarEvent
-from .mp_proxy import ProxyEvent, proxy_output_handler, Proxy
+from .mp_functions import print_exception, is_parent_process_alive, set_cpu_affinity, mark_task_done, get_task_done, \
+    unpack_events, drain_queue, LoopQueueSize, stop_event_loop, run_loop, process_event, run_event_loop, \
+    run_consumer_loop, OutputBuffer, QUEUE_TIMEOUT, DRAIN_SIZE, OUTPUT_BATCH_SIZE, OUTPUT_FLUSH_TIME, STOP_LOOP, \
+    load_events, load_shared_events, PickledEvents
+from .events import intern_key, Event, IterStepResult, CacheEvent, CacheObjectEvent, SaveVarEvent, VarEvent
+from .mp_proxy import ProxyEvent, ProxyBatchEvent, proxy_output_handler, Proxy, SharedArray, PICKLE_PROTOCOL, \
+    SHARED_MEMORY_SIZE
 from .event_loop import EventLoop
 try:
     from .async_event_loop import AsyncManager, AsyncEvent, AsyncEventLoop
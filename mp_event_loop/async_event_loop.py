@@ -1,13 +1,13 @@
 import sys
-import copy
 import inspect
 import types
 
 from queue import Empty
 
-from .events import Event, CacheEvent
+from .events import Event, IterStepResult, CacheEvent
 from .event_loop import EventLoop
-from .mp_functions import mark_task_done, LoopQueueSize, QUEUE_TIMEOUT, is_parent_process_alive
+from .mp_functions import get_task_done, drain_queue, LoopQueueSize, QUEUE_TIMEOUT, DRAIN_SIZE, \
+    is_parent_process_alive, set_cpu_affinity, STOP_LOOP
 
 __all__ = ['run_async_event_loop', 'AsyncEventLoop']
 
@@ -78,6 +78,8 @@ def get_async_results(coro):
 
 
 class AsyncEvent(Event):
+    __slots__ = ('coroutine_name',)
+
     def __init__(self, coroutine_name, *args, has_output=True, event_key=None, **kwargs):
         """Create the event.
 
@@ -112,28 +114,43 @@ class AsyncEvent(Event):
 
 
 class LoopAsyncQueueSize(LoopQueueSize):
-    """Iterator to iterate until the alive_event is cleared or the parent process dies then iterate the number of
-    queue.qsize().
+    """Iterator to iterate until the alive_event is cleared or the parent process dies then iterate until the queue is
+    empty.
     """
+    __slots__ = ('async_generator_events', 'check_countdown')
+
+    CHECK_INTERVAL = 64  # Iterations between checking if the parent process is alive while advancing
+
     def __init__(self, alive_event, queue, async_generator_events):
         self.async_generator_events = async_generator_events
+        self.check_countdown = 0
         super().__init__(alive_event, queue)
 
     def __next__(self):
-        if self.countdown > 0:
+        if self.draining:
+            if self.queue.empty():
+                raise StopIteration
+        elif self.countdown > 0:
             self.countdown -= 1
-        elif len(self.async_generator_events):
+            if self.countdown == 0:
+                raise StopIteration
+        elif self.async_generator_events:
+            # Only check the parent process periodically. Stop if nothing is left to receive the results.
+            self.check_countdown -= 1
+            if self.check_countdown <= 0:
+                self.check_countdown = self.CHECK_INTERVAL
+                if not is_parent_process_alive(self.ppid):
+                    raise StopIteration
             return "Continue Async"
         else:
-            should_iter = self.alive_event.is_set() and is_parent_process_alive()
-            if not should_iter:
-                self.countdown = self.queue.qsize()
-        if self.countdown == 0:
-            raise StopIteration
+            should_iter = self.alive_event.is_set() and is_parent_process_alive(self.ppid)
+            if not should_iter and not self.start_draining():
+                raise StopIteration
         return "Continue"
 
 
-def run_async_event_loop(alive_event, event_queue, consumer_queue=None, initialize_process=None):
+def run_async_event_loop(alive_event, event_queue, consumer_queue=None, initialize_process=None,
+                         drain_size=DRAIN_SIZE, cpu_affinity=None):
     """Run the event loop.
 
     Args:
@@ -143,7 +160,12 @@ def run_async_event_loop(alive_event, event_queue, consumer_queue=None, initiali
             to the thread.
         initialize_process (function)[None]: Function run at the start of the event loop. It should return a dictionary
             of variable name, object pairs.
+        drain_size (int)[DRAIN_SIZE]: Maximum number of events to get from the event queue at once.
+        cpu_affinity (list)[None]: CPU numbers to pin this process to.
     """
+    if cpu_affinity is not None:
+        set_cpu_affinity(cpu_affinity)
+
     # Create widgets and store the widgets
     cache = CacheEvent.CACHE  # This is the cache for this process
     if callable(initialize_process):
@@ -151,21 +173,24 @@ def run_async_event_loop(alive_event, event_queue, consumer_queue=None, initiali
         for key, val in variables.items():
             cache[key] = val
 
+    task_done = get_task_done(event_queue)
     async_generator_events = []
     # ===== Run the logging event loop =====
-    for _ in LoopAsyncQueueSize(alive_event, event_queue, async_generator_events):
-        event = None
-        if not event_queue.empty():
-            event = event_queue.get_nowait()
-
-        elif len(async_generator_events) == 0:
-            # Get an event an run it
-            try:
-                event = event_queue.get(timeout=QUEUE_TIMEOUT)
-            except Empty:
-                pass
+    loop = LoopAsyncQueueSize(alive_event, event_queue, async_generator_events)
+    for _ in loop:
+        # Block on the queue while there are no async generators to advance. Otherwise only check for new events
+        try:
+            events = drain_queue(event_queue, timeout=0 if async_generator_events else QUEUE_TIMEOUT,
+                                 max_items=drain_size)
+        except Empty:
+            events = []
+        loop.items_processed(len(events))
+
+        for event in events:
+            if event is STOP_LOOP or not isinstance(event, Event):
+                task_done()
+                continue
 
-        if isinstance(event, Event):
             # Run the event
             event.exec_()
             if event.results and isinstance(event.results, types.CoroutineType):
@@ -174,38 +199,39 @@ def run_async_event_loop(alive_event, event_queue, consumer_queue=None, initiali
                 except StopIteration:
                     event.results = None
 
-            if consumer_queue:
-                if event.results and isinstance(event.results, types.AsyncGeneratorType):
-                    event.async_generator = event.results
-                    async_generator_events.append(event)
-
-                elif event.has_output:
+            if consumer_queue and event.results and isinstance(event.results, types.AsyncGeneratorType):
+                async_generator_events.append(event)  # The event results are the async generator. Done when finished
+            else:
+                # Every other event is done now whether it has output or not
+                if consumer_queue and event.has_output:
                     consumer_queue.put(event)
-                    mark_task_done(event_queue)
+                task_done()
 
-        # Loop through the existing async_generators
-        offset = 0
-        for i in range(len(async_generator_events)):
-            event = async_generator_events[i + offset]
-            new_event = copy.copy(event)
+        # Loop through the existing async_generators. Move the live generators forward in place and drop the finished
+        live = 0
+        for event in async_generator_events:
+            results = error = None
+            has_results = True
             try:
-                coro = event.async_generator.asend(None)
-                new_event.results = get_async_results(coro)  # .send(None)
+                coro = event.results.asend(None)
+                results = get_async_results(coro)  # .send(None)
             except StopIteration:
                 # Every coro.send call will cause a StopIteration
-                continue
+                has_results = False
             except (StopAsyncIteration, AttributeError):
                 # The async generator is complete
-                async_generator_events.pop(i)
-                offset -= 1
-                mark_task_done(event_queue)
+                task_done()
                 continue
             except Exception as err:
-                new_event.error = err
+                error = err
+
+            async_generator_events[live] = event
+            live += 1
 
             # Put the results on the queue
-            if consumer_queue and new_event.has_output:
-                consumer_queue.put(new_event)
+            if has_results and consumer_queue and event.has_output:
+                consumer_queue.put(IterStepResult(results, error, event.has_output, event.event_key))
+        del async_generator_events[live:]
 
     alive_event.clear()
 
@@ -213,6 +239,7 @@ def run_async_event_loop(alive_event, event_queue, consumer_queue=None, initiali
 class AsyncEventLoop(EventLoop):
     """EventLoop to work with async/await coroutines."""
     run_event_loop = staticmethod(run_async_event_loop)
+    batch_events = False  # The loop marks each event done when it finishes, so events are put one at a time
 
     def async_event(self, coroutine_name, *args, has_output=None, event_key=None, **kwargs):
         """Add an event to be run in a separate process.
@@ -236,4 +263,4 @@ class AsyncEventLoop(EventLoop):
                 has_output = True
             event = AsyncEvent(coroutine_name, *args, has_output=has_output, event_key=event_key, **kwargs)
 
-        self.event_queue.put(event)
+        self.put_event(event)
@@ -1,15 +1,28 @@
-import atexit
+import weakref
 import threading
 
 import multiprocessing as mp
 
 from .events import Event, CacheEvent, CacheObjectEvent, SaveVarEvent, VarEvent
-from .mp_functions import print_exception, stop_event_loop, run_event_loop, run_consumer_loop
+from .mp_functions import print_exception, stop_event_loop, run_event_loop, run_consumer_loop, DRAIN_SIZE, \
+    SHARED_MEMORY_SIZE, PickledEvents
+
+try:
+    from multiprocessing import resource_tracker
+except ImportError:
+    resource_tracker = None
 
 
 __all__ = ['EventLoop']
 
 
+def _close_at_exit(loop_ref):
+    """Close the event loop at exit if it still exists. A garbage collected event loop closes itself in __del__."""
+    loop = loop_ref()
+    if loop is not None:
+        loop.close()
+
+
 class EventLoop(object):
     """Event loop that runs in a separate process.
 
@@ -27,6 +40,14 @@ class EventLoop(object):
     run_event_loop = staticmethod(run_event_loop)
     run_consumer_loop = staticmethod(run_consumer_loop)
 
+    drain_size = DRAIN_SIZE  # Maximum number of events the event process gets from the queue at once
+    batch_events = True  # The event process can run a list of events that was put on the queue as one item
+    cpu_affinity = None  # List of CPU numbers to pin the event process to
+    shared_memory_size = None  # put_events sends pickled events this large through shared memory. None to never use it
+    use_shm = False  # put_event also pickles single events with PickledEvents, so large events use shared memory
+    pending_size = 0  # Number of events add_event holds to put on the queue together. 0 puts each event right away
+    pending_time = 0.01  # Seconds add_event holds events before putting them on the queue
+
     def __init__(self, output_handlers=None, event_queue=None, consumer_queue=None, initialize_process=None,
                  name='main', has_results=True):
         """Create the event loop.
@@ -54,6 +75,7 @@ class EventLoop(object):
         self.name = str(name)
         self.has_results = has_results
         self._needs_to_close = False
+        self._finalizer = None
 
         self.alive_event = self.alive_event_class()
         self.event_queue = event_queue
@@ -65,6 +87,10 @@ class EventLoop(object):
         self.cache = {}
         self.output_handlers = [hndlr for hndlr in output_handlers]
 
+        self._pending = []  # Events held by add_event (see pending_size)
+        self._pending_lock = threading.RLock()
+        self._pending_timer = None
+
     # ========== Output Management ==========
     def add_output_handler(self, handler):
         """Add a function that handles the event output.
@@ -106,8 +132,56 @@ class EventLoop(object):
                     break
 
     # ========== Event Management ==========
-    def add_event(self, target, *args, has_output=None, event_key=None, cache=False, re_register=False, **kwargs):
-        """Add an event to be run in a separate process.
+    def put_event(self, event):
+        """Put the event on the event queue to be run in a separate process.
+
+        Args:
+            event (Event): Event to run in a separate process.
+        """
+        if self._pending:
+            self.flush_events()
+        self.event_queue.put(self.pack_event(event))
+
+    def pack_event(self, event):
+        """Return the event to put on the queue.
+
+        If use_shm is True the event is pickled once in this process (PickledEvents.store). An event with at least
+        shared_memory_size bytes (SHARED_MEMORY_SIZE if None) is sent through shared memory, and only the shared memory
+        name goes through the queue. A smaller event is sent as the pickled bytes, so the queue does not pickle it again.
+
+        Args:
+            event (Event): Event to run in a separate process.
+        """
+        if not self.use_shm or not self.batch_events:
+            return event
+
+        size = self.shared_memory_size
+        if size is None:
+            size = SHARED_MEMORY_SIZE
+        return PickledEvents.store([event], size)
+
+    def put_events(self, events):
+        """Put several events on the event queue as one item, so they are pickled and sent together.
+
+        The events are pickled once in this process with pickle protocol 5 (PickledEvents.store), so buffers like numpy
+        arrays are written out-of-band instead of being copied into the pickle. If shared_memory_size is set, large
+        events are copied into shared memory instead of going through the queue pipe.
+
+        Args:
+            events (list/tuple): Events to run in a separate process.
+        """
+        if self._pending:
+            self.flush_events()
+
+        events = list(events)
+        if len(events) == 1 or not self.batch_events:
+            for event in events:
+                self.put_event(event)
+        elif events:
+            self.event_queue.put(PickledEvents.store(events, self.shared_memory_size))
+
+    def create_event(self, target, *args, has_output=None, event_key=None, cache=False, re_register=False, **kwargs):
+        """Create an event to be run in a separate process.
 
         Args:
             target (function/method/callable/Event): Event or callable to run in a separate process.
@@ -124,8 +198,8 @@ class EventLoop(object):
         kwargs = kwargs.pop('kwargs', kwargs)
 
         if cache:
-            return self.add_cache_event(target, *args, has_output=has_output, event_key=event_key,
-                                        re_register=re_register, **kwargs)
+            return self.create_cache_event(target, *args, has_output=has_output, event_key=event_key,
+                                           re_register=re_register, **kwargs)
 
         elif isinstance(target, Event):
             event = target
@@ -135,10 +209,10 @@ class EventLoop(object):
                 has_output = True
             event = Event(target, *args, has_output=has_output, event_key=event_key, **kwargs)
 
-        self.event_queue.put(event)
+        return event
 
-    def add_cache_event(self, target, *args, has_output=None, event_key=None, re_register=False, **kwargs):
-        """Add an event that uses cached objects.
+    def create_cache_event(self, target, *args, has_output=None, event_key=None, re_register=False, **kwargs):
+        """Create an event that uses cached objects.
 
         Args:
             target (function/method/callable/Event): Event or callable to run in a separate process.
@@ -175,7 +249,71 @@ class EventLoop(object):
             event = CacheEvent(target, *args, has_output=has_output, event_key=event_key, cache=self.cache,
                                re_register=re_register, **kwargs)
 
-        self.event_queue.put(event)
+        return event
+
+    def add_event(self, target, *args, has_output=None, event_key=None, cache=False, re_register=False, **kwargs):
+        """Add an event to be run in a separate process.
+
+        Args:
+            target (function/method/callable/Event): Event or callable to run in a separate process.
+            *args (tuple): Arguments to pass into the target function.
+            has_output (bool) [False]: If True save the executed event and put it on the consumer/output queue.
+            event_key (str)[None]: Key to identify the event or output result.
+            cache (bool) [False]: If the target object should be cached.
+            re_register (bool)[False]: Forcibly register this object in the other process.
+            **kwargs (dict): Keyword arguments to pass into the target function.
+            args (tuple)[None]: Keyword args argument.
+            kwargs (dict)[None]: Keyword kwargs argument.
+        """
+        self.hold_event(self.create_event(target, *args, has_output=has_output, event_key=event_key, cache=cache,
+                                          re_register=re_register, **kwargs))
+
+    def add_cache_event(self, target, *args, has_output=None, event_key=None, re_register=False, **kwargs):
+        """Add an event that uses cached objects.
+
+        Args:
+            target (function/method/callable/Event): Event or callable to run in a separate process.
+            *args (tuple): Arguments to pass into the target function.
+            has_output (bool) [False]: If True save the executed event and put it on the consumer/output queue.
+            event_key (str)[None]: Key to identify the event or output result.
+            re_register (bool)[False]: Forcibly register this object in the other process.
+            **kwargs (dict): Keyword arguments to pass into the target function.
+            args (tuple)[None]: Keyword args argument.
+            kwargs (dict)[None]: Keyword kwargs argument.
+        """
+        self.hold_event(self.create_cache_event(target, *args, has_output=has_output, event_key=event_key,
+                                                re_register=re_register, **kwargs))
+
+    def hold_event(self, event):
+        """Hold the event to put it on the event queue with other events (see pending_size and pending_time).
+
+        The held events are put on the queue when pending_size events are held, after pending_time seconds, or when
+        another event is put on the queue. If pending_size is 0 the event is put on the event queue right away.
+
+        Args:
+            event (Event): Event to run in a separate process.
+        """
+        if not self.pending_size:
+            return self.put_event(event)
+
+        with self._pending_lock:
+            self._pending.append(event)
+            if len(self._pending) >= self.pending_size:
+                self.flush_events()
+            elif self._pending_timer is None:
+                self._pending_timer = threading.Timer(self.pending_time, self.flush_events)
+                self._pending_timer.daemon = True
+                self._pending_timer.start()
+
+    def flush_events(self):
+        """Put the events that are held by add_event on the event queue."""
+        with self._pending_lock:
+            events, self._pending = self._pending, []
+            timer, self._pending_timer = self._pending_timer, None
+            if timer is not None:
+                timer.cancel()
+            if events:
+                self.put_events(events)
 
     def cache_object(self, obj, has_output=False, event_key=None, re_register=False):
         """Save an object in the separate processes, so the object can persist.
@@ -200,7 +338,7 @@ class EventLoop(object):
             event = CacheObjectEvent(obj, has_output=has_output, event_key=event_key,
                                      cache=self.cache, re_register=re_register)
 
-        self.event_queue.put(event)
+        self.put_event(event)
 
     def is_object_cached(self, obj):
         """Return if the object is in the cache."""
@@ -305,6 +443,11 @@ class EventLoop(object):
         """Start running the separate process which runs an event loop."""
         self.close()
 
+        # Start the resource tracker before the processes, so they all share it. Shared memory that one process creates
+        # and another process unlinks is then unregistered, and shared memory that is never loaded is freed at exit.
+        if resource_tracker is not None:
+            resource_tracker.ensure_running()
+
         # Create the separate Process
         self.start_event_loop()
 
@@ -313,14 +456,21 @@ class EventLoop(object):
             self.start_consumer_loop()
 
         self._needs_to_close = True
-        atexit.register(self.close)
+
+        # Do not keep a reference to self at exit, so an event loop that is no longer used can be garbage collected
+        self._finalizer = weakref.finalize(self, _close_at_exit, weakref.ref(self))
+
+    def get_event_loop_kwargs(self):
+        """Return the keyword arguments for the run_event_loop function."""
+        return {'initialize_process': self.initialize_process, 'drain_size': self.drain_size,
+                'cpu_affinity': self.cpu_affinity}
 
     def start_event_loop(self):
         """Start running the event loop."""
         self.alive_event.set()
         self.event_process = self.event_loop_class(name="EventLoop-" + self.name, target=self.run_event_loop,
                                                    args=(self.alive_event, self.event_queue, self.consumer_queue),
-                                                   kwargs={'initialize_process': self.initialize_process})
+                                                   kwargs=self.get_event_loop_kwargs())
         self.event_process.daemon = True
         self.event_process.start()
 
@@ -377,6 +527,7 @@ class EventLoop(object):
 
     def wait(self):
         """Wait for the event queue and consumer queue to finish processing."""
+        self.flush_events()
         try:
             if self.is_event_process_alive():
                 self.event_queue.join()
@@ -395,25 +546,27 @@ class EventLoop(object):
         Warning:
             This will also stop the logging
         """
+        self.flush_events()
+
         # If has_results clear and join the consumer queue and process
         kwargs = {}
         if self.has_results:
             kwargs['consumer_process'] = self.consumer_process
+            kwargs['consumer_queue'] = self.consumer_queue
             self.consumer_process = None
 
         # Stop and clear the process and queue variables
-        stop_event_loop(self.alive_event, self.event_process, **kwargs)
+        stop_event_loop(self.alive_event, self.event_process, event_queue=self.event_queue, **kwargs)
         self.event_process = None
 
     def close(self):
         """Close the event loop."""
         if not self._needs_to_close:
             return
-        try:
-            self._needs_to_close = False
-            atexit.unregister(self.close)
-        except:
-            pass
+        self._needs_to_close = False
+        if self._finalizer is not None:
+            self._finalizer.detach()
+            self._finalizer = None
 
         self.wait()
         self.stop()
@@ -431,11 +584,15 @@ class EventLoop(object):
     def __setstate__(self, state):
         # Variables that are not saved
         self._needs_to_close = False
+        self._finalizer = None
         self.event_process = None
         self.consumer_process = None
         self.event_queue = None
         self.consumer_queue = None
         self.cache = {}
+        self._pending = []
+        self._pending_lock = threading.RLock()
+        self._pending_timer = None
 
         # Saved variables
         self.name = state.get('name', '')
@@ -1,10 +1,26 @@
+import sys
+import threading
 import types
 
-__all__ = ['Event', 'CacheEvent', 'CacheObjectEvent', 'SaveVarEvent', 'VarEvent']
+__all__ = ['intern_key', 'Event', 'IterStepResult', 'CacheEvent', 'CacheObjectEvent', 'SaveVarEvent', 'VarEvent']
+
+
+# Cache for this process (CacheEvent.CACHE). Lookups do not lock. Only registering objects uses the lock.
+_PROCESS_CACHE = {}
+_CACHE_LOCK = threading.RLock()
+
+
+def intern_key(event_key):
+    """Return the event_key interned if it is a str, so comparing it with the same key only compares the pointers."""
+    if type(event_key) is str:
+        return sys.intern(event_key)
+    return event_key
 
 
 class Event(object):
     """Basic event to run a function."""
+    __slots__ = ('target', 'args', 'kwargs', 'results', 'error', 'has_output', 'event_key')
+
     def __init__(self, target, *args, has_output=True, event_key=None, **kwargs):
         """Create the event.
 
@@ -28,25 +44,20 @@ class Event(object):
         self.results = None
         self.error = None
         self.has_output = has_output
-        self.event_key = event_key
+        self.event_key = intern_key(event_key)
 
     def run(self):
         """Run the actual command that was given and return the results"""
         return self.target(*self.args, **self.kwargs)
 
     def exec_(self):
-        """Get the command and run it"""
-        # Get the command to run
-        self.results = None
-        self.error = None
-        if callable(self.target):
-            # Run the command
-            try:
-                self.results = self.run()
-            except Exception as err:
-                self.error = err
-        elif self.target is not None:
-            self.error = ValueError("Invalid target (%s) given! Type %s" % (repr(self.target), str(type(self.target))))
+        """Get the command and run it. An invalid target is caught as the TypeError from calling it."""
+        try:
+            self.results = self.run()
+            self.error = None
+        except Exception as err:
+            self.results = None
+            self.error = err
 
     def __getstate__(self):
         """Return the state for pickling."""
@@ -64,7 +75,25 @@ class Event(object):
         self.results = state.get('results', None)
         self.error = state.get('error', None)
         self.has_output = state.get('has_output', False)
-        self.event_key = state.get('event_key', None)
+        self.event_key = intern_key(state.get('event_key', None))
+
+
+class IterStepResult(object):
+    """Results for one step of an iterator or async generator event.
+
+    This is put on the consumer queue instead of a copy of the event, so the target, args, and kwargs are not pickled
+    again for every step.
+    """
+    __slots__ = ('results', 'error', 'has_output', 'event_key')
+
+    def __init__(self, results=None, error=None, has_output=True, event_key=None):
+        self.results = results
+        self.error = error
+        self.has_output = has_output
+        self.event_key = intern_key(event_key)
+
+    def __reduce__(self):
+        return IterStepResult, (self.results, self.error, self.has_output, self.event_key)
 
 
 # ========== Cache Event ==========
@@ -72,8 +101,10 @@ class CacheEvent(Event):
     """Event that saves an object or command in the separate process to prevent passing the object back and forth
     between processes.
     """
+    __slots__ = ('_target', '_method_func', 'cache_id', 'cache', 'register', 'object_id', 'method_name', 'object')
 
-    CACHE = {}
+    CACHE = _PROCESS_CACHE
+    METHODS = {}
     DO_NOT_REGISTER_TYPE = (str, bytes, int, float, complex)
 
     @staticmethod
@@ -88,9 +119,36 @@ class CacheEvent(Event):
     def get_or_register_object(obj_id, obj):
         """Find and return the registered object or register the given object."""
         # Get the cache from the cache id
-        if not isinstance(obj, CacheEvent.DO_NOT_REGISTER_TYPE) and obj is not None and obj_id not in CacheEvent.CACHE:
-            CacheEvent.CACHE[obj_id] = obj
-        return CacheEvent.CACHE.get(obj_id, obj)
+        cache = _PROCESS_CACHE
+        if obj_id not in cache and obj is not None and not isinstance(obj, CacheEvent.DO_NOT_REGISTER_TYPE):
+            with _CACHE_LOCK:
+                return cache.setdefault(obj_id, obj)
+        return cache.get(obj_id, obj)
+
+    @staticmethod
+    def get_method_function(obj, method_name):
+        """Return the plain function for the method name from the object's class or None.
+
+        The lookup is saved per class and method name. None is returned for static methods, class methods, other
+        descriptors, instance attributes, and attributes that are found through __getattr__. getattr should be used
+        for these.
+        """
+        key = (type(obj), method_name)
+        try:
+            func = CacheEvent.METHODS[key]
+        except KeyError:
+            func = None
+            for cls in type(obj).__mro__:
+                if method_name in cls.__dict__:
+                    func = cls.__dict__[method_name]
+                    if not isinstance(func, types.FunctionType):
+                        func = None
+                    break
+            CacheEvent.METHODS[key] = func
+
+        if func is not None and method_name in getattr(obj, '__dict__', {}):
+            return None  # Instance attribute overrides the class method
+        return func
 
     @classmethod
     def is_object_registered(cls, obj, name=None, cache=None):
@@ -98,7 +156,7 @@ class CacheEvent(Event):
         if name is None:
             name = cls.get_object_key(obj)
         if cache is None:
-            cache = CacheEvent.CACHE
+            cache = _PROCESS_CACHE
         return obj is not None and cache.get(name, None) == obj
 
     @classmethod
@@ -107,8 +165,9 @@ class CacheEvent(Event):
         if name is None:
             name = cls.get_object_key(obj)
         if cache is None:
-            cache = CacheEvent.CACHE
-        cache[name] = obj
+            cache = _PROCESS_CACHE
+        with _CACHE_LOCK:
+            cache[name] = obj
         return name
 
     def __init__(self, target, *args, has_output=True, event_key=None, cache=None, re_register=False, **kwargs):
@@ -129,20 +188,17 @@ class CacheEvent(Event):
         args = kwargs.pop('args', args)
         kwargs = kwargs.pop('kwargs', kwargs)
 
-        # Try to get the object from a method
-        try:
-            obj = target.__self__
-            cmd = target.__name__
-            if obj is None or isinstance(obj, types.ModuleType):
-                obj = target
-                cmd = None
-        except AttributeError:
+        # Try to get the object from a method. Functions and builtin functions (__self__ is a module) use the target
+        obj = getattr(target, '__self__', None)
+        cmd = None
+        if obj is not None and type(obj) is not types.ModuleType:
+            cmd = getattr(target, '__name__', None)
+        if cmd is None:
             obj = target
-            cmd = None
 
         # Setup for multiple caches
         if cache is None:
-            cache = CacheEvent.CACHE
+            cache = _PROCESS_CACHE
         self.cache_id = CacheEvent.get_object_key(cache)
         self.cache = CacheEvent.get_or_register_object(self.cache_id, cache)
 
@@ -152,13 +208,27 @@ class CacheEvent(Event):
         self.method_name = cmd
         self.object = obj
 
-        # Get the key for cached objects
-        args = tuple(self._key_cached_object(arg, cache=self.cache) for arg in args)
-        kwargs = {key: self._key_cached_object(val, cache=self.cache) for key, val in kwargs.items()}
+        # Get the key for cached objects. Only create new args and kwargs if something may be cached.
+        if args and self._has_cached_object(args, cache=self.cache):
+            args = tuple(self._key_cached_object(arg, cache=self.cache) for arg in args)
+        if kwargs and self._has_cached_object(kwargs.values(), cache=self.cache):
+            kwargs = {key: self._key_cached_object(val, cache=self.cache) for key, val in kwargs.items()}
 
         # Initialize
         super().__init__(target, *args, has_output=has_output, event_key=event_key, **kwargs)
 
+    @property
+    def target(self):
+        """Return the target. The bound method is only created if it was found from the object's class."""
+        if self._target is None and self._method_func is not None:
+            self._target = types.MethodType(self._method_func, self.object)
+        return self._target
+
+    @target.setter
+    def target(self, value):
+        self._target = value
+        self._method_func = None
+
     def _cache_object_with_register(self, obj, re_register=False, cache=None):
         """Check if the object is cached and register it to be cached.
 
@@ -168,7 +238,7 @@ class CacheEvent(Event):
             cache (dict)[None]: Cache to check and register the object with.
         """
         if cache is None:
-            cache = CacheEvent.CACHE
+            cache = _PROCESS_CACHE
 
         # Check if the object needs to be created in the other process
         object_id = CacheEvent.get_object_key(obj)
@@ -179,11 +249,21 @@ class CacheEvent(Event):
 
         return object_id
 
+    @staticmethod
+    def _has_cached_object(values, cache=None):
+        """Return if any of the values may be a cached object. The key is only checked, so this can be a false positive.
+        """
+        if cache is None:
+            cache = _PROCESS_CACHE
+
+        get_object_key = CacheEvent.get_object_key
+        return any(get_object_key(val) in cache for val in values)
+
     @staticmethod
     def _key_cached_object(obj, cache=None):
         """If the object is cached return the key for that object."""
         if cache is None:
-            cache = CacheEvent.CACHE
+            cache = _PROCESS_CACHE
 
         object_id = CacheEvent.get_object_key(obj)
         if not isinstance(obj, CacheEvent.DO_NOT_REGISTER_TYPE) and obj is not None and \
@@ -191,33 +271,23 @@ class CacheEvent(Event):
             return object_id
         return obj
 
-    def exec_(self):
-        """Get the command and run it"""
-        # Get the command to run
-        self.results = None
-        self.error = None
-        if callable(self.target):
-            # Run the command
-            try:
-                self.results = self.run()
-            except Exception as err:
-                self.error = err
-        elif self.target is None and self.object is not None:
-            self.results = self.object
-        else:
-            self.error = ValueError("Invalid target (%s) given! Type %s" % (repr(self.target), str(type(self.target))))
+    def run(self):
+        """Run the actual command that was given and return the results"""
+        if self._method_func is not None:
+            return self._method_func(self.object, *self.args, **self.kwargs)
+        return self.target(*self.args, **self.kwargs)
 
     def __getstate__(self):
         """Return the state for pickling.
 
         Do not pass the target. Pass the items to be registered, the target object_id and method_name.
         """
-        # Normal Event variables
-        state = super().__getstate__()
-        state.pop('target', None)
-        state.update({'cache_id': self.cache_id, 'register': self.register,
-                      'object_id': self.object_id, 'method_name': self.method_name})
-        return state
+        # Normal Event variables without the target, so the bound method is not created to be dropped
+        return {'args': self.args, 'kwargs': self.kwargs,
+                'results': self.results, 'error': self.error,
+                'has_output': self.has_output, 'event_key': self.event_key,
+                'cache_id': self.cache_id, 'register': self.register,
+                'object_id': self.object_id, 'method_name': self.method_name}
 
     def __setstate__(self, state):
         """Set the object variables after pickling.
@@ -233,7 +303,7 @@ class CacheEvent(Event):
 
         # Get the cache from the cache id
         self.cache_id = state.get('cache_id', None)
-        self.cache = CacheEvent.get_or_register_object(self.cache_id, CacheEvent.CACHE)
+        self.cache = CacheEvent.get_or_register_object(self.cache_id, _PROCESS_CACHE)
 
         # Register the items with the cache
         self.register = []
@@ -249,7 +319,11 @@ class CacheEvent(Event):
         # Get the target from the method name
         self.method_name = state.get('method_name', self.method_name)
         if self.method_name:
-            self.target = getattr(self.object, self.method_name, None)
+            func = CacheEvent.get_method_function(self.object, self.method_name)
+            if func is not None:
+                self._method_func = func  # The bound method is only created if the target is accessed
+            else:
+                self.target = getattr(self.object, self.method_name, None)
         else:
             self.target = self.object
 
@@ -259,6 +333,13 @@ class CacheEvent(Event):
 
 
 class CacheObjectEvent(CacheEvent):
+    __slots__ = ()
+
+    def exec_(self):
+        """Do not run a function. The results are the cached object."""
+        self.results = self.object
+        self.error = None
+
     def __setstate__(self, state):
         super().__setstate__(state)
         # No not run a function. Only cache the object
@@ -270,6 +351,8 @@ class SaveVarEvent(CacheEvent):
     """Save the given object as the given variable name. You can then call methods on the object with the variable name
     using a VarEvent.
     """
+    __slots__ = ()
+
     def __init__(self, create_func, *args, has_output=True, event_key=None, cache=None, re_register=False,
                  **kwargs):
         """Create the event.
@@ -289,32 +372,21 @@ class SaveVarEvent(CacheEvent):
         super().__init__(create_func, *args, has_output=has_output, event_key=event_key,
                          cache=cache, re_register=re_register, **kwargs)
 
-    def exec_(self):
-        """Get the command and run it"""
-        # Get the command to run
-        self.results = None
-        self.error = None
-        if callable(self.target):
-            # Run the command
-            try:
-                results = self.run()
-
-                # Results should be a dictionary.
-                for key, value in results.items():
-                    CacheEvent.register_object(value, key, cache=self.cache)
+    def run(self):
+        """Run the create function and register the returned variables. Return True"""
+        results = super().run()
 
-                self.results = True
+        # Results should be a dictionary.
+        for key, value in results.items():
+            CacheEvent.register_object(value, key, cache=self.cache)
 
-            except Exception as err:
-                self.error = err
-        elif self.target is None and self.object is not None:
-            self.results = self.object
-        else:
-            self.error = ValueError("Invalid target (%s) given! Type %s" % (repr(self.target), str(type(self.target))))
+        return True
 
 
 class VarEvent(CacheEvent):
     """Run a method on a variable in a different process."""
+    __slots__ = ()
+
     def __init__(self, var_name, method_name, *args, has_output=True, event_key=None, cache=None, re_register=False,
                  **kwargs):
         """Create the event.
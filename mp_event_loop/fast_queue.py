@@ -0,0 +1,220 @@
+"""
+Joinable queues with a faster transport than multiprocessing.JoinableQueue.
+
+FastQueue uses faster_fifo. faster_fifo moves messages through a shared memory circular buffer and can read many
+messages with one lock, which is faster than the pipe and feeder thread of multiprocessing.Queue for many small events.
+faster_fifo is optional.
+
+PipeQueue writes each message straight to a multiprocessing.Pipe without a feeder thread. It works well for streaming
+many small results back to the main process (IterEventLoop(fast_pipe=True)).
+
+..code-block :: python
+
+    >>> import mp_event_loop
+    >>> from mp_event_loop.fast_queue import FastQueue
+    >>>
+    >>> mp_event_loop.EventLoop.queue_class = FastQueue
+    >>> loop = mp_event_loop.EventLoop()
+    >>>
+    >>> # Only use FastQueue for the single reader event queues of a sharded pool
+    >>> mp_event_loop.Pool.shard_queue_class = FastQueue
+    >>> pool = mp_event_loop.Pool(4, shard_queues=True)
+"""
+import multiprocessing as mp
+from multiprocessing.reduction import ForkingPickler
+from queue import Empty, Full
+
+try:
+    import faster_fifo
+except ImportError:
+    faster_fifo = None
+
+
+__all__ = ['FastQueue', 'PipeQueue', 'QUEUE_SIZE_BYTES']
+
+
+QUEUE_SIZE_BYTES = 10 * 1024 * 1024
+QUEUE_WAIT = 10.0  # faster_fifo needs a timeout. Wait in steps when blocking forever
+
+
+class FastQueue(object):
+    """faster_fifo.Queue with the JoinableQueue task_done and join methods used by the event loops."""
+
+    def __init__(self, max_size_bytes=QUEUE_SIZE_BYTES, ctx=None, maxsize=0):
+        """Create the queue.
+
+        Args:
+            max_size_bytes (int)[QUEUE_SIZE_BYTES]: Size of the shared memory buffer. This limits the size of an event.
+            ctx (multiprocessing.context)[None]: Context to create the task_done semaphore and condition with.
+            maxsize (int)[0]: Maximum number of items on the queue like multiprocessing.Queue(maxsize). If 0 only the
+                buffer size limits the queue.
+        """
+        if faster_fifo is None:
+            raise ImportError('FastQueue requires the faster_fifo library! Please install faster-fifo.')
+        if ctx is None:
+            ctx = mp
+
+        if maxsize > 0:
+            self._queue = faster_fifo.Queue(max_size_bytes, maxsize=maxsize)
+        else:
+            self._queue = faster_fifo.Queue(max_size_bytes)
+        self._unfinished_tasks = ctx.Semaphore(0)
+        self._cond = ctx.Condition()
+
+    def put(self, obj, block=True, timeout=None):
+        """Put an item on the queue."""
+        # Count the task before putting, so task_done cannot run first. Like multiprocessing.JoinableQueue only hold
+        # the condition to count. A full queue would otherwise block task_done and join while put waits.
+        with self._cond:
+            self._unfinished_tasks.release()
+        try:
+            if not block or timeout is not None:
+                self._queue.put(obj, block=block, timeout=timeout or 0)
+            else:
+                while True:
+                    try:
+                        self._queue.put(obj, timeout=QUEUE_WAIT)
+                        break
+                    except Full:
+                        pass
+        except BaseException:
+            self.task_done()
+            raise
+
+    def put_nowait(self, obj):
+        """Put an item on the queue without blocking."""
+        return self.put(obj, block=False)
+
+    def get(self, block=True, timeout=None):
+        """Return an item from the queue."""
+        if not block or timeout is not None:
+            return self._queue.get(block=block, timeout=timeout or 0)
+
+        while True:
+            try:
+                return self._queue.get(timeout=QUEUE_WAIT)
+            except Empty:
+                pass
+
+    def get_nowait(self):
+        """Return an item from the queue without blocking."""
+        return self.get(block=False)
+
+    def get_many(self, block=True, timeout=None, max_messages_to_get=1000000000):
+        """Return a list of the available items. faster_fifo reads them with one lock instead of one lock per item."""
+        if not block or timeout is not None:
+            return self._queue.get_many(block=block, timeout=timeout or 0, max_messages_to_get=max_messages_to_get)
+
+        while True:
+            try:
+                return self._queue.get_many(timeout=QUEUE_WAIT, max_messages_to_get=max_messages_to_get)
+            except Empty:
+                pass
+
+    def qsize(self):
+        """Return the approximate number of items in the queue."""
+        return self._queue.qsize()
+
+    def empty(self):
+        """Return if the queue is empty."""
+        return self._queue.empty()
+
+    def task_done(self):
+        """Indicate that an item from the queue was processed."""
+        with self._cond:
+            if not self._unfinished_tasks.acquire(False):
+                raise ValueError('task_done() called too many times')
+            if self._unfinished_tasks._semlock._is_zero():
+                self._cond.notify_all()
+
+    def join(self):
+        """Block until all items in the queue have been processed."""
+        with self._cond:
+            if not self._unfinished_tasks._semlock._is_zero():
+                self._cond.wait()
+
+    def close(self):
+        """Close the queue."""
+        self._queue.close()
+
+
+class PipeQueue(object):
+    """Joinable queue that sends messages through a multiprocessing.Pipe.
+
+    put pickles and writes the message in the calling thread instead of handing it to a feeder thread, so a message is
+    on the pipe when put returns. A large message blocks put until the reader reads it.
+    """
+
+    def __init__(self, ctx=None):
+        """Create the queue.
+
+        Args:
+            ctx (multiprocessing.context)[None]: Context to create the pipe, locks, and task_done semaphore with.
+        """
+        if ctx is None:
+            ctx = mp
+
+        self._reader, self._writer = ctx.Pipe(duplex=False)
+        self._rlock = ctx.Lock()
+        self._wlock = ctx.Lock()
+        self._unfinished_tasks = ctx.Semaphore(0)
+        self._cond = ctx.Condition()
+
+    def put(self, obj, block=True, timeout=None):
+        """Put an item on the queue. The pipe has no maximum size, so block and timeout are not used."""
+        data = ForkingPickler.dumps(obj)
+
+        # Count the task before writing. Do not hold the condition while a large message waits for the reader.
+        with self._cond:
+            self._unfinished_tasks.release()
+        with self._wlock:
+            self._writer.send_bytes(data)
+
+    def put_nowait(self, obj):
+        """Put an item on the queue without blocking."""
+        return self.put(obj, block=False)
+
+    def get(self, block=True, timeout=None):
+        """Return an item from the queue."""
+        if not block:
+            timeout = 0
+        if not self._rlock.acquire(block, timeout):
+            raise Empty
+        try:
+            if timeout is not None and not self._reader.poll(timeout):
+                raise Empty
+            data = self._reader.recv_bytes()
+        finally:
+            self._rlock.release()
+        return ForkingPickler.loads(data)
+
+    def get_nowait(self):
+        """Return an item from the queue without blocking."""
+        return self.get(block=False)
+
+    def qsize(self):
+        """A pipe cannot count its messages."""
+        raise NotImplementedError
+
+    def empty(self):
+        """Return if the queue is empty."""
+        return not self._reader.poll()
+
+    def task_done(self):
+        """Indicate that an item from the queue was processed."""
+        with self._cond:
+            if not self._unfinished_tasks.acquire(False):
+                raise ValueError('task_done() called too many times')
+            if self._unfinished_tasks._semlock._is_zero():
+                self._cond.notify_all()
+
+    def join(self):
+        """Block until all items in the queue have been processed."""
+        with self._cond:
+            if not self._unfinished_tasks._semlock._is_zero():
+                self._cond.wait()
+
+    def close(self):
+        """Close the queue."""
+        self._reader.close()
+        self._writer.close()
@@ -1,37 +1,58 @@
-import copy
+import collections
 from queue import Empty
 
-from mp_event_loop.events import Event, CacheEvent
+from mp_event_loop.events import Event, IterStepResult, CacheEvent
 from mp_event_loop.event_loop import EventLoop
-from mp_event_loop.mp_functions import mark_task_done, LoopQueueSize, QUEUE_TIMEOUT, is_parent_process_alive
+from mp_event_loop.pool import Pool
+from mp_event_loop.fast_queue import PipeQueue
+from mp_event_loop.mp_functions import get_task_done, drain_queue, LoopQueueSize, QUEUE_TIMEOUT, DRAIN_SIZE, \
+    is_parent_process_alive, set_cpu_affinity, OutputBuffer, STOP_LOOP
 
 
-__all__ = ['run_iter_event_loop', 'IterEventLoop']
+__all__ = ['run_iter_event_loop', 'IterEventLoop', 'IterPool', 'YIELD_AFTER']
+
+
+YIELD_AFTER = 32  # Maximum number of iterators to advance before checking the event queue for new events
 
 
 class LoopIterQueueSize(LoopQueueSize):
-    """Iterator to iterate until the alive_event is cleared or the parent process dies then iterate the number of
-    queue.qsize().
+    """Iterator to iterate until the alive_event is cleared or the parent process dies then iterate until the queue is
+    empty.
     """
+    __slots__ = ('iter_events', 'check_countdown')
+
+    CHECK_INTERVAL = 64  # Iterations between checking if the parent process is alive while advancing
+
     def __init__(self, alive_event, queue, iter_events):
         self.iter_events = iter_events
+        self.check_countdown = 0
         super().__init__(alive_event, queue)
 
     def __next__(self):
-        if self.countdown > 0:
+        if self.draining:
+            if self.queue.empty():
+                raise StopIteration
+        elif self.countdown > 0:
             self.countdown -= 1
-        elif len(self.iter_events):
+            if self.countdown == 0:
+                raise StopIteration
+        elif self.iter_events:
+            # Only check the parent process periodically. Stop if nothing is left to receive the results.
+            self.check_countdown -= 1
+            if self.check_countdown <= 0:
+                self.check_countdown = self.CHECK_INTERVAL
+                if not is_parent_process_alive(self.ppid):
+                    raise StopIteration
             return "Continue Async"
         else:
-            should_iter = self.alive_event.is_set() and is_parent_process_alive()
-            if not should_iter:
-                self.countdown = self.queue.qsize()
-        if self.countdown == 0:
-            raise StopIteration
+            should_iter = self.alive_event.is_set() and is_parent_process_alive(self.ppid)
+            if not should_iter and not self.start_draining():
+                raise StopIteration
         return "Continue"
 
 
-def run_iter_event_loop(alive_event, event_queue, consumer_queue=None, initialize_process=None):
+def run_iter_event_loop(alive_event, event_queue, consumer_queue=None, initialize_process=None,
+                        drain_size=DRAIN_SIZE, cpu_affinity=None, yield_after=YIELD_AFTER):
     """Run the event loop.
 
     Args:
@@ -41,7 +62,13 @@ def run_iter_event_loop(alive_event, event_queue, consumer_queue=None, initializ
             to the thread.
         initialize_process (function)[None]: Function run at the start of the event loop. It should return a dictionary
             of variable name, object pairs.
+        drain_size (int)[DRAIN_SIZE]: Maximum number of events to get from the event queue at once.
+        cpu_affinity (list)[None]: CPU numbers to pin this process to.
+        yield_after (int)[YIELD_AFTER]: Maximum number of iterators to advance before checking for new events.
     """
+    if cpu_affinity is not None:
+        set_cpu_affinity(cpu_affinity)
+
     # Create widgets and store the widgets
     cache = CacheEvent.CACHE  # This is the cache for this process
     if callable(initialize_process):
@@ -49,90 +76,139 @@ def run_iter_event_loop(alive_event, event_queue, consumer_queue=None, initializ
         for key, val in variables.items():
             cache[key] = val
 
-    iter_events = []
-    # ===== Run the logging event loop =====
-    for _ in LoopIterQueueSize(alive_event, event_queue, iter_events):  # Iterate until not alive and queue is empty
-        event = None
-        if not event_queue.empty():
-            event = event_queue.get_nowait()
+    # Collect the results and put them on the consumer queue together
+    output = None
+    if consumer_queue:
+        output = OutputBuffer(consumer_queue)
 
-        elif len(iter_events) == 0:
-            try:
-                event = event_queue.get(timeout=QUEUE_TIMEOUT)
-            except Empty:
-                pass
+    task_done = get_task_done(event_queue)
+    iter_events = collections.deque()  # (iterator, has_output, event_key) of the running iterators
+    # ===== Run the logging event loop =====
+    loop = LoopIterQueueSize(alive_event, event_queue, iter_events)
+    for _ in loop:  # Iterate until not alive and queue is empty
+        # Block on the queue while there are no iterators to advance. Otherwise only check for new events
+        try:
+            events = drain_queue(event_queue, timeout=0 if iter_events else QUEUE_TIMEOUT, max_items=drain_size)
+        except Empty:
+            events = []
+        loop.items_processed(len(events))
+
+        done = 0  # Events are marked done after their results are put on the consumer queue
+        for event in events:
+            if event is STOP_LOOP or not isinstance(event, Event):
+                done += 1
+                continue
 
-        if isinstance(event, Event):
             # Run the event
             event.exec_()
-            if consumer_queue:
-                if is_iterable(event.results):
-                    event.iter = event.results
-                    iter_events.append(event)
-
-                elif event.has_output:
-                    consumer_queue.put(event)
-                    mark_task_done(event_queue)
-
-        # Loop through the iterators
-        offset = 0
-        for i in range(len(iter_events)):
-            event = iter_events[i + offset]
-            new_event = copy.copy(event)
+            if output is not None and is_iterable(event.results):
+                # Only keep what advancing needs. The event results are the iterator. It is done when it finishes
+                iter_events.append((event.results, event.has_output, event.event_key))
+            else:
+                # Every other event is done now whether it has output or not
+                if output is not None and event.has_output:
+                    output.put(event)
+                done += 1
+
+        # Advance at most yield_after iterators before checking for new events again. The advanced iterators that are
+        # not finished rotate to the back, so every iterator gets a turn.
+        for _ in range(min(len(iter_events), yield_after)):
+            iterator, has_output, event_key = iter_events[0]
+            results = error = None
             try:
-                new_event.results = next(event.iter)
+                results = next(iterator)
             except (TypeError, StopIteration):
-                iter_events.pop(i)
-                offset -= 1
-                mark_task_done(event_queue)
+                iter_events.popleft()
+                done += 1
                 continue
             except Exception as err:
-                new_event.error = err
+                error = err
+
+            iter_events.rotate(-1)
 
             # Put the results on the queue
-            if consumer_queue and new_event.has_output:
-                consumer_queue.put(new_event)
+            if output is not None and has_output:
+                output.put(IterStepResult(results, error, has_output, event_key))
+
+        if output is not None:
+            output.flush()
+        for _ in range(done):
+            task_done()
 
     alive_event.clear()
 
 
+_ITERABLE_TYPES = {}  # Cache of type, is iterable. Being iterable and callable is a property of the type
+
+
 def is_iterable(obj):
     """Return if an object is iterable and not callable."""
-    return not callable(obj) and (hasattr(obj, '__iter__') and not type(obj) == type)
+    obj_type = type(obj)
+    try:
+        return _ITERABLE_TYPES[obj_type]
+    except KeyError:
+        iterable = _ITERABLE_TYPES[obj_type] = not callable(obj) and hasattr(obj_type, '__iter__') and \
+            obj_type is not type
+        return iterable
 
 
 class IterEventMixin(object):
+    __slots__ = ()
+
     def exec_(self):
-        """Get the command and run it"""
-        # Get the command to run
-        self.results = None
-        self.error = None
-        if is_iterable(self.target):
+        """Save the iterable target as the results or run the command."""
+        # A method found from the object's class is callable. Do not create the bound method to check it
+        if getattr(self, '_method_func', None) is None and is_iterable(self.target):
             # Save the iterable
             self.results = self.target
-        elif callable(self.target):
-            # Run the command
-            try:
-                self.results = self.run()
-            except Exception as err:
-                self.error = err
+            self.error = None
         else:
-            self.error = ValueError("Invalid target (%s) given! Type %s" % (repr(self.target), str(type(self.target))))
+            super().exec_()
 
 
 class IterEvent(IterEventMixin, Event):
-    pass
+    __slots__ = ()
 
 
 class IterCacheEvent(IterEventMixin, CacheEvent):
-    pass
+    __slots__ = ()
 
 
 class IterEventLoop(EventLoop):
     run_event_loop = staticmethod(run_iter_event_loop)
+    batch_events = False  # The loop marks each event done when it finishes, so events are put one at a time
+
+    yield_after = YIELD_AFTER  # Maximum number of iterators to advance before checking for new events
+
+    def __init__(self, output_handlers=None, event_queue=None, consumer_queue=None, initialize_process=None,
+                 name='main', has_results=True, fast_pipe=False):
+        """Create the event loop.
+
+        Args:
+            output_handlers (list/tuple/callable)[None]: Function or list of funcs that executed events with results.
+            event_queue (Queue)[None]: Custom event queue for the event loop.
+            consumer_queue (Queue)[None]: Custom consumer queue for the consumer process.
+            initialize_process (function)[None]: Function to create and show widgets returning a dict of widgets and
+                variable names to save for use.
+            name (str)['main']: Event loop name. This name is passed to the event process and consumer process.
+            has_results (bool)[True]: Should this event loop create a consumer process to run executed events
+                through process_output.
+            fast_pipe (bool)[False]: If no consumer_queue is given, send the iterator results back through a PipeQueue,
+                which writes each result straight to a pipe instead of through the queue's feeder thread.
+        """
+        if fast_pipe and consumer_queue is None:
+            consumer_queue = PipeQueue()
+        super().__init__(output_handlers=output_handlers, event_queue=event_queue, consumer_queue=consumer_queue,
+                         initialize_process=initialize_process, name=name, has_results=has_results)
+
+    def get_event_loop_kwargs(self):
+        """Return the keyword arguments for the run_event_loop function."""
+        kwargs = super().get_event_loop_kwargs()
+        kwargs['yield_after'] = self.yield_after
+        return kwargs
 
-    def add_event(self, target, *args, has_output=None, event_key=None, cache=False, re_register=False, **kwargs):
-        """Add an event to be run in a separate process.
+    def create_event(self, target, *args, has_output=None, event_key=None, cache=False, re_register=False, **kwargs):
+        """Create an event to be run in a separate process.
 
         Args:
             target (function/method/callable/Event): Event or callable to run in a separate process.
@@ -149,8 +225,8 @@ class IterEventLoop(EventLoop):
         kwargs = kwargs.pop('kwargs', kwargs)
 
         if cache:
-            return self.add_cache_event(target, *args, has_output=has_output, event_key=event_key,
-                                        re_register=re_register, **kwargs)
+            return self.create_cache_event(target, *args, has_output=has_output, event_key=event_key,
+                                           re_register=re_register, **kwargs)
 
         elif isinstance(target, Event):
             event = target
@@ -160,10 +236,10 @@ class IterEventLoop(EventLoop):
                 has_output = True
             event = IterEvent(target, *args, has_output=has_output, event_key=event_key, **kwargs)
 
-        self.event_queue.put(event)
+        return event
 
-    def add_cache_event(self, target, *args, has_output=None, event_key=None, re_register=False, **kwargs):
-        """Add an event that uses cached objects.
+    def create_cache_event(self, target, *args, has_output=None, event_key=None, re_register=False, **kwargs):
+        """Create an event that uses cached objects.
 
         Args:
             target (function/method/callable/Event): Event or callable to run in a separate process.
@@ -200,4 +276,10 @@ class IterEventLoop(EventLoop):
             event = IterCacheEvent(target, *args, has_output=has_output, event_key=event_key, cache=self.cache,
                                    re_register=re_register, **kwargs)
 
-        self.event_queue.put(event)
+        return event
+
+
+class IterPool(Pool, IterEventLoop):
+    """Create multiple long running event loops that iterate through iterable results."""
+
+    EVENT_LOOP = IterEventLoop
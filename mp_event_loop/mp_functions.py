@@ -1,9 +1,14 @@
+import io
 import os
 import sys
+import time
 import traceback
+import pickle
+import functools
 from queue import Empty
+from multiprocessing.reduction import ForkingPickler
 
-from .events import Event, CacheEvent
+from .events import Event, IterStepResult, CacheEvent
 
 try:
     import psutil
@@ -13,13 +18,47 @@ except ImportError as err:
     # traceback.print_exception(ImportError, ImportError(warning_msg), exc_tb)
     psutil = None
 
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
 
-__all__ = ['print_exception', 'is_parent_process_alive', 'mark_task_done', 'LoopQueueSize',
-           'stop_event_loop', 'run_loop', 'process_event', 'run_event_loop', 'run_consumer_loop',
-           'QUEUE_TIMEOUT']
+__all__ = ['print_exception', 'is_parent_process_alive', 'set_cpu_affinity', 'mark_task_done', 'get_task_done',
+           'unpack_events', 'drain_queue', 'LoopQueueSize', 'stop_event_loop', 'run_loop', 'process_event',
+           'run_event_loop', 'run_consumer_loop', 'OutputBuffer', 'QUEUE_TIMEOUT', 'DRAIN_SIZE', 'OUTPUT_BATCH_SIZE',
+           'OUTPUT_FLUSH_TIME', 'STOP_LOOP', 'PICKLE_PROTOCOL', 'SHARED_MEMORY_SIZE', 'load_events',
+           'load_shared_events', 'PickledEvents']
 
 
 QUEUE_TIMEOUT = 2
+DRAIN_SIZE = 64
+OUTPUT_BATCH_SIZE = 32  # Maximum number of results to put on the consumer queue as one list
+OUTPUT_FLUSH_TIME = 0.01  # Seconds to hold results before putting them on the consumer queue
+PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL  # Protocol 5 writes buffers (numpy arrays, PickleBuffer) without a copy
+SHARED_MEMORY_SIZE = 1024 * 1024  # Pickled data with at least this many bytes is sent through shared memory
+
+OUTPUT_TYPES = (Event, IterStepResult)  # Items on the consumer queue that are passed to process_output
+
+PARENT_CHECK_TTL = 0.1  # Seconds to reuse the last is_parent_process_alive result
+_LAST_PARENT_CHECK = (None, 0.0, True)  # ppid, time.monotonic() of the check, is alive
+
+
+class StopLoop(object):
+    """Item put on a queue to wake up a loop that is waiting on the queue, so it sees that it should stop.
+
+    There is only one instance (STOP_LOOP). It unpickles as the same object, so loops can check it with `is`.
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return 'STOP_LOOP'
+
+    def __repr__(self):
+        return 'STOP_LOOP'
+
+
+STOP_LOOP = StopLoop()
 
 
 def print_exception(exc, msg=None):
@@ -30,11 +69,55 @@ def print_exception(exc, msg=None):
     traceback.print_exception(exc.__class__, exc, exc_tb)
 
 
-def is_parent_process_alive():
-    """Return if the parent process is alive. This relies on psutil, but is optional."""
+def is_parent_process_alive(ppid=None):
+    """Return if the parent process is alive. This relies on psutil, but is optional.
+
+    The result is reused for PARENT_CHECK_TTL seconds, so busy loops do not check the process table for every event.
+
+    Args:
+        ppid (int)[None]: Parent process id saved when the process started. If the parent dies os.getppid() returns
+            the id of the process that adopted this process.
+    """
+    global _LAST_PARENT_CHECK
     if psutil is None:
         return True
-    return psutil.pid_exists(os.getppid())
+    if ppid is None:
+        ppid = os.getppid()
+
+    now = time.monotonic()
+    last_ppid, last_time, is_alive = _LAST_PARENT_CHECK
+    if ppid == last_ppid and now - last_time < PARENT_CHECK_TTL:
+        return is_alive
+
+    is_alive = psutil.pid_exists(ppid)
+    _LAST_PARENT_CHECK = (ppid, now, is_alive)
+    return is_alive
+
+
+def set_cpu_affinity(cpus):
+    """Pin the current process to the given CPUs.
+
+    Pinning keeps a busy event process and it's cached objects on the same core, but pinning more processes than
+    there are cores makes them compete for the same core. Nothing happens if the platform does not support it.
+
+    Args:
+        cpus (list/set): CPU numbers that this process is allowed to run on.
+
+    Returns:
+        success (bool): True if the affinity was set.
+    """
+    cpus = set(cpus)
+    try:
+        os.sched_setaffinity(0, cpus)
+        return True
+    except (AttributeError, OSError, ValueError):
+        pass
+
+    try:
+        psutil.Process().cpu_affinity(sorted(cpus))
+        return True
+    except (AttributeError, OSError, ValueError):
+        return False
 
 
 def mark_task_done(que):
@@ -46,45 +129,266 @@ def mark_task_done(que):
         pass
 
 
+def _no_task_done():
+    """Queue is not a JoinableQueue. There is nothing to mark done."""
+    pass
+
+
+def get_task_done(que):
+    """Return a function to mark an item of the given queue as done.
+
+    The queue is checked once, so a loop does not raise and catch an AttributeError for every item of a queue that
+    is not a JoinableQueue. A JoinableQueue's task_done method is returned directly, so each item does not go through
+    mark_task_done. It raises a ValueError if it is called more times than items were put on the queue.
+
+    Args:
+        que (multiprocessing.Queue/multiprocessing.JoinableQueue): Queue to mark items done for.
+    """
+    if not callable(getattr(que, 'task_done', None)):
+        return _no_task_done
+    return que.task_done
+
+
+def unpack_events(items):
+    """Iterate the events of the items from the queue. A list is several events that were put on the queue together.
+    """
+    for item in items:
+        if type(item) is list:
+            yield from item
+        else:
+            yield item
+
+
+def drain_queue(que, timeout=QUEUE_TIMEOUT, max_items=DRAIN_SIZE):
+    """Return a list of queue items. Block for the first item then get the available items without blocking.
+
+    Queues with a get_many method (FastQueue) return the items from one read.
+
+    Args:
+        que (Queue): Queue to get the items from.
+        timeout (float)[QUEUE_TIMEOUT]: Time to wait for the first item.
+        max_items (int)[DRAIN_SIZE]: Maximum number of items to return.
+
+    Raises:
+        Empty: If no item was available before the timeout.
+    """
+    get_many = getattr(que, 'get_many', None)
+    if get_many is not None:
+        return get_many(timeout=timeout, max_messages_to_get=max_items)
+
+    items = [que.get(timeout=timeout)]
+    try:
+        while len(items) < max_items:
+            items.append(que.get_nowait())
+    except Empty:
+        pass
+    return items
+
+
 class LoopQueueSize(object):
-    """Iterator to iterate until the alive_event is cleared or the parent process dies then iterate the number of
-    queue.qsize().
+    """Iterator to iterate until the alive_event is cleared or the parent process dies then iterate until the queue is
+    empty.
     """
+    __slots__ = ('queue', 'alive_event', 'countdown', 'draining', 'ppid')
+
     def __init__(self, alive_event, queue):
         self.queue = queue
         self.alive_event = alive_event
         self.countdown = -1
+        self.draining = False
+        self.ppid = os.getppid()
 
     def __iter__(self):
         self.countdown = -1
+        self.draining = False
         return self
 
     def next(self):
         return self.__next__()
 
     def __next__(self):
-        if self.countdown > 0:
+        if self.draining:
+            if self.queue.empty():
+                self.draining = False
+                raise StopIteration
+        elif self.countdown > 0:
             self.countdown -= 1
         elif self.countdown == 0:
             self.countdown = -1
             raise StopIteration
         else:
-            should_iter = self.alive_event.is_set() and is_parent_process_alive()
-            if not should_iter:
-                self.countdown = self.queue.qsize()
-                if self.countdown == 0:
-                    self.countdown = -1
-                    raise StopIteration
+            should_iter = self.alive_event.is_set() and is_parent_process_alive(self.ppid)
+            if not should_iter and not self.start_draining():
+                self.countdown = -1
+                raise StopIteration
         return "Continue"
 
+    def start_draining(self):
+        """Stop waiting for new items and only iterate until the queue is empty. Return False if the queue is empty.
+
+        The countdown of queue.qsize() is only used for a queue that cannot check if it is empty, because qsize raises
+        NotImplementedError on macOS.
+        """
+        try:
+            self.draining = not self.queue.empty()
+            return self.draining
+        except (AttributeError, NotImplementedError):
+            self.countdown = self.queue.qsize()
+            return self.countdown > 0
+
+    def items_processed(self, count):
+        """Count the queue items that were processed in one iteration, so a final countdown does not wait on an
+        empty queue.
+        """
+        if self.countdown > 0:
+            self.countdown = max(self.countdown - count + 1, 0)
+
+
+def load_events(data, buffers):
+    """Return the events that PickledEvents pickled with their out-of-band buffers.
+
+    Args:
+        data (bytes): Pickled list of events.
+        buffers (tuple): Out-of-band buffers of the pickled events.
+    """
+    return pickle.loads(data, buffers=buffers)
+
+
+def load_shared_events(name, sizes):
+    """Return the pickled events and out-of-band buffers from shared memory and free the shared memory.
+
+    Args:
+        name (str): Shared memory name.
+        sizes (tuple): Size of the pickled events followed by the size of each buffer stored after them.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        buffers = []
+        offset = sizes[0]
+        for size in sizes[1:]:
+            buffers.append(bytearray(shm.buf[offset: offset + size]))
+            offset += size
+        return pickle.loads(shm.buf[:sizes[0]], buffers=buffers)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+class PickledEvents(object):
+    """Several events that were pickled once in the main process with PICKLE_PROTOCOL and out-of-band buffers.
+
+    Small pickled events are put on the queue as the pickled bytes, so the queue does not pickle the events again.
+    Large pickled events are copied into shared memory and only the shared memory name and sizes go through the queue
+    pipe. The events are unpickled as a list in the event process.
+    """
+    __slots__ = ('data', 'buffers', 'name', 'sizes')
+
+    def __init__(self, data=None, buffers=(), name=None, sizes=None):
+        self.data = data
+        self.buffers = buffers
+        self.name = name
+        self.sizes = sizes
+
+    @classmethod
+    def store(cls, events, shared_memory_size=SHARED_MEMORY_SIZE):
+        """Pickle the events once and return PickledEvents to put on the queue. Pickled events with at least
+        shared_memory_size bytes are sent through shared memory.
+
+        The events are pickled with multiprocessing's ForkingPickler, so Connections and other objects with
+        multiprocessing reducers still work. Buffers (numpy arrays, PickleBuffer) are pickled out-of-band and copied into
+        shared memory without joining them into one bytes object first.
+
+        If the events cannot be pickled here the list of events is returned for the queue to pickle.
+
+        Args:
+            events (list): Events to run in a separate process.
+            shared_memory_size (int)[SHARED_MEMORY_SIZE]: Pickled events with at least this many bytes are sent
+                through shared memory. If None shared memory is not used.
+        """
+        events = list(events)
+        buffers = []
+        stream = io.BytesIO()
+        try:
+            # ForkingPickler only passes positional arguments to Pickler (file, protocol, fix_imports, buffer_callback)
+            ForkingPickler(stream, PICKLE_PROTOCOL, True, buffers.append).dump(events)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Let the queue pickle the events (Ex. a library set with mp_event_loop.use() can pickle more objects)
+            return events
+
+        buffers = [buf.raw() for buf in buffers]
+        sizes = (stream.tell(),) + tuple(len(buf) for buf in buffers)
+        if shared_memory is None or shared_memory_size is None or sum(sizes) < shared_memory_size:
+            # Send the pickled bytes. bytearray buffers keep numpy arrays writable like a normal unpickle
+            return cls(stream.getvalue(), tuple(bytearray(buf) for buf in buffers))
+
+        data = stream.getbuffer()
+        shm = shared_memory.SharedMemory(create=True, size=max(sum(sizes), 1))
+        offset = 0
+        for value in [data] + buffers:
+            shm.buf[offset: offset + len(value)] = value
+            offset += len(value)
+        pickled = cls(name=shm.name, sizes=sizes)
+        shm.close()
+
+        # Keep the resource tracker registration. The event process unlinks the shared memory, which unregisters it
+        # from the shared resource tracker. If it is never loaded the tracker frees it at exit.
+        return pickled
+
+    def __reduce__(self):
+        if self.name is not None:
+            return load_shared_events, (self.name, self.sizes)
+        return load_events, (self.data, self.buffers)
+
+
+class OutputBuffer(object):
+    """Collect results and put them on the consumer queue as one list.
+
+    The results are put on the queue when max_items are collected, when flush_time has passed since the last put, or
+    when flush is called. The event loop must call flush before it marks the events done and before it blocks on the
+    event queue.
+    """
+    __slots__ = ('queue', 'items', 'max_items', 'flush_time', 'last_flush')
+
+    def __init__(self, queue, max_items=OUTPUT_BATCH_SIZE, flush_time=OUTPUT_FLUSH_TIME):
+        self.queue = queue
+        self.items = []
+        self.max_items = max_items
+        self.flush_time = flush_time
+        self.last_flush = time.monotonic()
+
+    def put(self, item):
+        """Add a result to be put on the queue."""
+        self.items.append(item)
+        if len(self.items) >= self.max_items or time.monotonic() - self.last_flush >= self.flush_time:
+            self.flush()
+
+    def flush(self):
+        """Put the collected results on the queue. A single result is put on its own."""
+        items = self.items
+        if items:
+            self.items = []
+            self.queue.put(items if len(items) > 1 else items[0])
+        self.last_flush = time.monotonic()
+
+
+def wake_loop(que, process=None):
+    """Put STOP_LOOP on the queue if the process is alive, so it does not wait for the queue timeout to stop."""
+    try:
+        if que is not None and process.is_alive():
+            que.put(STOP_LOOP)
+    except (AttributeError, Exception):
+        pass
+
 
-def stop_event_loop(alive_event, event_process=None, consumer_process=None):
+def stop_event_loop(alive_event, event_process=None, consumer_process=None, event_queue=None, consumer_queue=None):
     """Stop the event loop and consumer loop.
 
     Args:
         alive_event (multiprocessing.Event): Event to signal that the process is closing and exit the loop.
         event_process (Process/Thread)[None]: Multiprocessing process to join and quit
         consumer_process (Thread/Process)[None]: Thread to join and quit. (Thread that consumes)
+        event_queue (Queue)[None]: Queue the event process waits on. STOP_LOOP is put on it to wake the process.
+        consumer_queue (Queue)[None]: Queue the consumer waits on. STOP_LOOP is put on it to wake the consumer.
     """
     try:
         alive_event.clear()
@@ -92,19 +396,22 @@ def stop_event_loop(alive_event, event_process=None, consumer_process=None):
         pass
 
     # Stop the event loop
+    wake_loop(event_queue, event_process)
     try:
         event_process.join()
     except (AttributeError, Exception):
         pass
 
     # Stop the consumer loop
+    wake_loop(consumer_queue, consumer_process)
     try:
         consumer_process.join()
     except (AttributeError, Exception):
         pass
 
 
-def run_loop(process_queue_data, alive_event, event_queue, consumer_queue=None, initialize_process=None):
+def run_loop(process_queue_data, alive_event, event_queue, consumer_queue=None, initialize_process=None,
+             drain_size=DRAIN_SIZE, cpu_affinity=None):
     """Run the event loop.
 
     Args:
@@ -115,22 +422,35 @@ def run_loop(process_queue_data, alive_event, event_queue, consumer_queue=None,
         consumer_queue (multiprocessing.Queue/multiprocessing.JoinableQueue)[None]: Output queue of events.
         initialize_process (function)[None]: Function run at the start of the event loop. It should return a dictionary
             of variable name, object pairs.
+        drain_size (int)[DRAIN_SIZE]: Maximum number of events to get from the event queue at once.
+        cpu_affinity (list)[None]: CPU numbers to pin this process to.
     """
+    if cpu_affinity is not None:
+        set_cpu_affinity(cpu_affinity)
+
     # Create widgets and store the widgets
     variables = {}
     if callable(initialize_process):
         variables = initialize_process()
 
+    # Bind the keyword arguments once instead of for every event
+    process_data = functools.partial(process_queue_data, consumer_queue=consumer_queue, variables=variables)
+    task_done = get_task_done(event_queue)
+
     # ===== Run the logging event loop =====
-    for _ in LoopQueueSize(alive_event, event_queue):  # Iterate until a stop case then iterate the queue.qsize
+    loop = LoopQueueSize(alive_event, event_queue)
+    for _ in loop:  # Iterate until a stop case then iterate until the queue is empty
         try:
-            event = event_queue.get(timeout=QUEUE_TIMEOUT)
+            events = drain_queue(event_queue, timeout=QUEUE_TIMEOUT, max_items=drain_size)
+        except Empty:
+            continue
+
+        loop.items_processed(len(events))
+        for event in events:
             try:
-                process_queue_data(event, consumer_queue=consumer_queue, variables=variables)
+                process_data(event)
             finally:  # Don't want the queue join to wait forever.
-                mark_task_done(event_queue)
-        except Empty:
-            pass
+                task_done()
 
     alive_event.clear()
 
@@ -140,17 +460,17 @@ def process_event(event, consumer_queue=None):
 
     Args:
         event (Event): Event to execute
-        even
         consumer_queue (Queue)[None]: Queue to put the results on.
     """
     if isinstance(event, Event):
         # Run the event
         event.exec_()
-        if consumer_queue and event.has_output:
+        if event.has_output and consumer_queue is not None:
             consumer_queue.put(event)
 
 
-def run_event_loop(alive_event, event_queue, consumer_queue=None, initialize_process=None):
+def run_event_loop(alive_event, event_queue, consumer_queue=None, initialize_process=None, drain_size=DRAIN_SIZE,
+                   cpu_affinity=None):
     """Run the event loop.
 
     Args:
@@ -159,7 +479,12 @@ def run_event_loop(alive_event, event_queue, consumer_queue=None, initialize_pro
         consumer_queue (multiprocessing.Queue/multiprocessing.JoinableQueue)[None]: Output queue of events.
         initialize_process (function)[None]: Function run at the start of the event loop. It should return a dictionary
             of variable name, object pairs.
+        drain_size (int)[DRAIN_SIZE]: Maximum number of events to get from the event queue at once.
+        cpu_affinity (list)[None]: CPU numbers to pin this process to.
     """
+    if cpu_affinity is not None:
+        set_cpu_affinity(cpu_affinity)
+
     # Create widgets and store the widgets
     cache = CacheEvent.CACHE  # This is the cache for this process
     if callable(initialize_process):
@@ -167,16 +492,35 @@ def run_event_loop(alive_event, event_queue, consumer_queue=None, initialize_pro
         for key, val in variables.items():
             cache[key] = val
 
+    # Collect the results and put them on the consumer queue together
+    output = None
+    if consumer_queue is not None:
+        output = OutputBuffer(consumer_queue)
+
+    # Bind the keyword arguments once instead of for every event
+    process = functools.partial(process_event, consumer_queue=output)
+    task_done = get_task_done(event_queue)
+
     # ===== Run the logging event loop =====
-    for _ in LoopQueueSize(alive_event, event_queue):  # Iterate until a stop case then iterate the queue.qsize
+    loop = LoopQueueSize(alive_event, event_queue)
+    for _ in loop:  # Iterate until a stop case then iterate until the queue is empty
         try:
-            event = event_queue.get(timeout=QUEUE_TIMEOUT)
-            try:
-                process_event(event, consumer_queue=consumer_queue)
-            finally:  # Don't want the queue join to wait forever.
-                mark_task_done(event_queue)
+            events = drain_queue(event_queue, timeout=QUEUE_TIMEOUT, max_items=drain_size)
         except Empty:
-            pass
+            continue
+
+        loop.items_processed(len(events))
+        try:
+            for event in unpack_events(events):
+                process(event)
+        finally:
+            # Put the results on the consumer queue before the events are done, so wait sees the results
+            if output is not None:
+                output.flush()
+
+            # Don't want the queue join to wait forever.
+            for _ in events:
+                task_done()
 
     alive_event.clear()
 
@@ -189,16 +533,22 @@ def run_consumer_loop(alive_event, consumer_queue, process_output):
         consumer_queue (multiprocessing.Queue/multiprocessing.JoinableQueue)[None]: Output queue of events.
         process_output (callable): Function/method to consume the events.
     """
-    for _ in LoopQueueSize(alive_event, consumer_queue):
+    task_done = get_task_done(consumer_queue)
+    loop = LoopQueueSize(alive_event, consumer_queue)
+    for _ in loop:
         try:
-            event = consumer_queue.get(timeout=QUEUE_TIMEOUT)
-            try:
-                if isinstance(event, Event):
+            events = drain_queue(consumer_queue, timeout=QUEUE_TIMEOUT)
+        except Empty:
+            continue
+
+        loop.items_processed(len(events))
+        try:
+            for event in unpack_events(events):
+                if isinstance(event, OUTPUT_TYPES):
                     # Process the output
                     process_output(event)
-            finally:  # Don't want the queue join to wait forever.
-                mark_task_done(consumer_queue)
-        except Empty:
-            pass
+        finally:  # Don't want the queue join to wait forever.
+            for _ in events:
+                task_done()
 
     alive_event.clear()
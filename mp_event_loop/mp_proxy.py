@@ -21,22 +21,95 @@ separate from the main cache. We actually store each cache in the global CacheEv
 caches in the main process allowing multiple event loops with separate caches ... This systems basically saves
 everything to cache and passes id's back and forth in order to keep track of objects.
 """
+import types
+import weakref
+import contextlib
+
 from .events import Event, CacheEvent
+from .mp_functions import PICKLE_PROTOCOL, SHARED_MEMORY_SIZE  # PICKLE_PROTOCOL is only re-exported here
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+
+__all__ = ['ProxyEvent', 'ProxyBatchEvent', 'proxy_output_handler', 'Proxy', 'SharedArray', 'PICKLE_PROTOCOL',
+           'SHARED_MEMORY_SIZE']
+
+
+_LOCAL_CACHE = {}  # {cache id: cache} found by Proxy.__setstate__ in this process
+_LOCAL_LOOPS = {}  # {loop id: loop} found by Proxy.__setstate__ in this process
+
+
+class SharedArray(object):
+    """Numpy array passed to the main process through shared memory. Only the name, shape, and dtype are pickled."""
+    __slots__ = ('name', 'shape', 'dtype')
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    @classmethod
+    def store(cls, value):
+        """Copy a large numpy array into shared memory and return a SharedArray. Other values are returned unchanged.
+        """
+        if np is None or shared_memory is None or type(value) is not np.ndarray or \
+                value.nbytes < SHARED_MEMORY_SIZE or value.dtype.hasobject:
+            return value
+
+        shm = shared_memory.SharedMemory(create=True, size=value.nbytes)
+        try:
+            np.ndarray(value.shape, value.dtype, buffer=shm.buf)[...] = value
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+        shared = cls(shm.name, value.shape, value.dtype)
+        shm.close()
+
+        # Keep the resource tracker registration. The process that loads the array unlinks the shared memory, which
+        # unregisters it from the shared resource tracker. If it is never loaded the tracker frees it at exit.
+        return shared
+
+    def load(self):
+        """Copy the array out of shared memory and free the shared memory."""
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            shared = np.ndarray(self.shape, self.dtype, buffer=shm.buf)
+            value = shared.copy()
+            del shared
+        finally:
+            shm.close()
+            shm.unlink()
+        return value
 
 
-__all__ = ['ProxyEvent', 'proxy_output_handler', 'Proxy']
+def _load_value(value):
+    """Return the value or the array for a SharedArray."""
+    if isinstance(value, SharedArray):
+        return value.load()
+    return value
 
 
 def _get_getter_value(func):
     """Return the getter function value or None."""
     try:
         return func()
-    except:
+    except Exception:
         return None
 
 
 class ProxyEvent(Event):
     """The ProxyEvent needs nothing done to it. All of the syncing and caching is done in the Proxy.__setstate__."""
+    __slots__ = ('object', 'method_name')
+
     def __init__(self, obj, method_name=None, *args, has_output=True, event_key=None, **kwargs):
         """Create the event.
 
@@ -61,22 +134,6 @@ class ProxyEvent(Event):
         # Initialize
         super().__init__(obj, *args, has_output=has_output, event_key=event_key, **kwargs)
 
-    def exec_(self):
-        """Get the command and run it"""
-        # Get the command to run
-        self.results = None
-        self.error = None
-        if callable(self.target):
-            # Run the command
-            try:
-                self.results = self.run()
-            except Exception as err:
-                self.error = err
-        elif self.target is None and self.object is not None:
-            self.results = self.object
-        else:
-            self.error = ValueError("Invalid target (%s) given! Type %s" % (repr(self.target), str(type(self.target))))
-
     def __getstate__(self):
         """Return the state for pickling.
 
@@ -93,8 +150,6 @@ class ProxyEvent(Event):
 
         Register all of the cached items. Get the target from the target object_id and method_name.
         """
-        super().__setstate__(state)
-
         self.object = state.pop('object', None)
         self.method_name = state.pop('method_name', None)
         if self.method_name:
@@ -105,9 +160,108 @@ class ProxyEvent(Event):
         super().__setstate__(state)
 
 
+class ProxyBatchEvent(Event):
+    """Run several ProxyEvents in the other process with one event. The events are pickled and put on the queue once,
+    and a proxy that several of the events use is only pickled once.
+    """
+    __slots__ = ('events',)
+
+    def __init__(self, events, event_key=None):
+        """Create the event.
+
+        Args:
+            events (list): List of ProxyEvents to run in order.
+            event_key (str)[None]: Key to identify the event or output result.
+        """
+        self.events = list(events)
+        super().__init__(None, has_output=any(event.has_output for event in self.events), event_key=event_key)
+
+    def exec_(self):
+        """Run every event. The results are a list of each event's results. The error is the first error."""
+        for event in self.events:
+            event.exec_()
+        self.results = [event.results for event in self.events]
+        self.error = next((event.error for event in self.events if event.error is not None), None)
+
+    def __getstate__(self):
+        """Return the state for pickling."""
+        state = super().__getstate__()
+        state['events'] = self.events
+        state.pop('target', None)
+        return state
+
+    def __setstate__(self, state):
+        """Set the object variables after pickling."""
+        super().__setstate__(state)
+        self.events = state.get('events', [])
+
+
+class ProxyProperty(object):
+    """Return a PROPERTIES value from the proxy values or the real object in the separate process."""
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        proxy = obj.__proxy__
+        if proxy:
+            return proxy.get(self.name, None)
+        return getattr(obj.__object__, self.name)
+
+
+class ProxyGetter(ProxyProperty):
+    """Return a GETTERS function that returns the synced value or the real object's method in the separate process."""
+    __slots__ = ()
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        proxy = obj.__proxy__
+        if proxy:
+            name = self.name
+
+            def getter_func(*args, **kwargs):
+                return proxy.get(name, None)
+            return getter_func
+        return getattr(obj.__object__, self.name)
+
+
+_CALL_IN_PROCESS_FUNCS = {}  # {method name: function(proxy, *args, **kwargs)}
+
+
+def _get_call_in_process_func(name):
+    """Return the function that calls the method name in the separate process. One function is made per name."""
+    try:
+        return _CALL_IN_PROCESS_FUNCS[name]
+    except KeyError:
+        def getter_call_in_process(self, *args, **kwargs):
+            self._call_in_process(self.__loop__, self, name, *args, **kwargs)
+        getter_call_in_process.__name__ = name
+        return _CALL_IN_PROCESS_FUNCS.setdefault(name, getter_call_in_process)
+
+
+class ProxyMethod(ProxyProperty):
+    """Return a function that calls the PROXY_CLASS method in the separate process or the real object's method."""
+    __slots__ = ('func',)
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.func = _get_call_in_process_func(name)
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if obj.__proxy__:
+            return types.MethodType(self.func, obj)
+        return getattr(obj.__object__, self.name)
+
+
 def proxy_output_handler(event):
     """Handle the proxy event output. Nothing needs to happen here. All of the syncing is done in Proxy.__setstate__."""
-    if isinstance(event, ProxyEvent):
+    if isinstance(event, (ProxyEvent, ProxyBatchEvent)):
         return True
 
 
@@ -119,17 +273,39 @@ class Proxy(object):
         Proxy values take a long time to sync. This object is more for controlling and calling methods for an object
         that lives in a different process.
     """
+    # Instance values are stored in slots. A subclass may set __loop__ on the class to use it as the default loop.
+    # Subclasses without __slots__ have a __dict__ for their own values and instance PROPERTIES and GETTERS.
+    __slots__ = ('__cache_id__', '__loop_id__', '__proxy_id__', '__loop__', '__cache__', '__proxy__', '__object__',
+                 '__args__', '__kwargs__', '__batch__')
+
     SLOTS = ['__cache_id__', '__loop_id__', '__proxy_id__', '__loop__',  '__cache__', '__proxy__', '__object__',
-             '__args__', '__kwargs__',
+             '__args__', '__kwargs__', '__batch__',
              'PROXY_CLASS', 'PROPERTIES', 'GETTERS', 'SLOTS', 'create_mp_object']
+    SLOTS_SET = frozenset(SLOTS)
 
-    __loop__ = None
+    LOOP_IDS = weakref.WeakKeyDictionary()  # {loop: (loop id, cache id, cache)}
 
     # Required properties
     PROXY_CLASS = dict
     PROPERTIES = []
     GETTERS = []
 
+    def __init_subclass__(cls, **kwargs):
+        """Create the PROPERTIES, GETTERS, and PROXY_CLASS method attributes once, so accessing them does not go
+        through __getattr__. Names that the class already has are left alone.
+        """
+        super().__init_subclass__(**kwargs)
+        cls.SLOTS_SET = frozenset(cls.SLOTS)
+
+        names = [(name, ProxyGetter) for name in cls.GETTERS]
+        names.extend((name, ProxyProperty) for name in cls.PROPERTIES)
+        names.extend((name, ProxyMethod) for name in dir(cls.PROXY_CLASS)
+                     if not name.startswith('_') and callable(getattr(cls.PROXY_CLASS, name, None)))
+
+        for name, descriptor in names:
+            if name not in cls.SLOTS_SET and not name.startswith('__') and not hasattr(cls, name):
+                setattr(cls, name, descriptor(name))
+
     def create_mp_object(self, *args, **kwargs):
         """Take in known properties and getters and return a single object to exist in the separate process and be
         referenced by the proxy.
@@ -143,9 +319,11 @@ class Proxy(object):
     def sync_mp_object(self):
         """Synchronize the multiprocessing object with the proxy. This should not need to be called."""
         if self.__loop__:
-            # Try to make the proxy_output_handler run first
-            if proxy_output_handler not in self.__loop__.output_handlers:
-                self.__loop__.insert_output_handler(0, proxy_output_handler)
+            # Try to make the proxy_output_handler run first. Only check the output handlers once for each loop.
+            if not getattr(self.__loop__, '_proxy_output_installed', False):
+                if proxy_output_handler not in self.__loop__.output_handlers:
+                    self.__loop__.insert_output_handler(0, proxy_output_handler)
+                self.__loop__._proxy_output_installed = True
 
             # Automate starting the loop
             if not self.__loop__.is_running():
@@ -158,11 +336,44 @@ class Proxy(object):
     def _call_in_process(loop, obj, method_name=None, *args, **kwargs):
         """Call the target function in a separate process."""
         if loop is not None:
-            pe = ProxyEvent(obj, method_name, *args, **kwargs)
-            loop.add_event(pe)
+            # The output only syncs the PROPERTIES and GETTERS. Do not send it back if there is nothing to sync.
+            has_output = bool(obj.PROPERTIES or obj.GETTERS)
+            pe = ProxyEvent(obj, method_name, *args, has_output=has_output, **kwargs)
+            batch = getattr(obj, '__batch__', None)
+            if batch is not None:
+                batch.append(pe)
+            else:
+                loop.add_event(pe)
             return True
         return False
 
+    @contextlib.contextmanager
+    def mp_batch(self):
+        """Collect the method calls and attribute changes made in this context and send them to the separate process
+        as one event when the context exits.
+
+        A nested mp_batch adds its calls to the outer batch, which sends them. If the context raises an error the
+        collected calls are not sent.
+
+        .. code-block:: python
+
+            >>> with proxy.mp_batch():
+            >>>     proxy.move(1, 2)
+            >>>     proxy.set_z(3)
+        """
+        if self.__batch__ is not None:
+            yield self
+            return
+
+        self.__batch__ = []
+        try:
+            yield self
+            events = self.__batch__
+        finally:
+            self.__batch__ = None
+        if events and self.__loop__ is not None:
+            self.__loop__.add_event(ProxyBatchEvent(events, event_key=self.__proxy_id__))
+
     def mp_wait(self):
         """Wait for all multiprocessing events. This makes this objects value sync."""
         self.__loop__.wait()
@@ -171,24 +382,47 @@ class Proxy(object):
         """Return if this object is the proxy object that lives in the main process."""
         return bool(self.__proxy__)
 
+    @staticmethod
+    def register_loop(loop):
+        """Register the loop and its cache. Return the loop id, cache id, and cache.
+
+        The result is saved in LOOP_IDS for the life of the loop, so creating more proxies does not register again.
+        The saved value does not reference the loop, so the weak key can be removed.
+        """
+        loop_id = CacheEvent.get_object_key(loop)
+        registered_loop = CacheEvent.get_or_register_object(loop_id, loop)
+
+        # Check and set the cache
+        try:
+            cache = registered_loop.cache
+        except AttributeError:
+            cache = CacheEvent.CACHE
+        cache_id = CacheEvent.get_object_key(cache)
+        cache = CacheEvent.get_or_register_object(cache_id, cache)
+
+        ids = (loop_id, cache_id, cache)
+        try:
+            Proxy.LOOP_IDS[loop] = ids
+        except TypeError:
+            pass  # The loop cannot be weakly referenced
+        return ids
+
     def __init__(self, *args, loop=None, **kwargs):
         # Check and set the event loop
         if loop is None:
             loop = self.__loop__
         if loop is None:
             raise ValueError("Invalid multiprocessing event loop for the proxy!")
-        self.__loop_id__ = CacheEvent.get_object_key(loop)
-        self.__loop__ = CacheEvent.get_or_register_object(self.__loop_id__, loop)
-
-        # Check and set the cache
+        # Get the registered loop and cache ids
         try:
-            cache = self.__loop__.cache
-        except AttributeError:
-            cache = CacheEvent.CACHE
-        self.__cache_id__ = CacheEvent.get_object_key(cache)
-        self.__cache__ = CacheEvent.get_or_register_object(self.__cache_id__, cache)
+            ids = Proxy.LOOP_IDS[loop]
+        except (KeyError, TypeError):
+            ids = self.register_loop(loop)
+        self.__loop__ = loop
+        self.__loop_id__, self.__cache_id__, self.__cache__ = ids
 
         # Set the main variables
+        self.__batch__ = None
         self.__args__ = tuple()
         self.__kwargs__ = {}
         self.__proxy__ = {None: None}
@@ -204,38 +438,42 @@ class Proxy(object):
         self.__kwargs__ = kwargs
 
     def __getattr__(self, item):
-        try:
-            proxy = self.__proxy__
-            if proxy:
-                if item in self.GETTERS:
-                    def getter_func(*args, **kwargs):
-                        return proxy.get(item, None)
-                    return getter_func
-                elif item in self.PROPERTIES or item in proxy:
+        if item in type(self).SLOTS_SET:
+            # Slot has not been set yet
+            if item == '__loop__':
+                return None  # No loop was given or set on the class
+            raise AttributeError("'object' has no attribute " + repr(item))
+
+        proxy = self.__proxy__
+        if proxy:
+            if item in self.GETTERS:
+                def getter_func(*args, **kwargs):
                     return proxy.get(item, None)
+                return getter_func
+            elif item in self.PROPERTIES or item in proxy:
+                return proxy.get(item, None)
 
-                # Check if function should be called in a different process
-                elif not item.startswith('__') and not item.endswith('__'):
-                    def getter_call_in_process(*args, **kwargs):
-                        self._call_in_process(self.__loop__, self, item, *args, **kwargs)
-                    getter_call_in_process.__name__ = item
-                    return getter_call_in_process
-            else:
-                # Object exists in a different process
+            # Check if function should be called in a different process
+            elif not item.startswith('__') and not item.endswith('__'):
+                return types.MethodType(_get_call_in_process_func(item), self)
+        else:
+            # Object exists in a different process
+            try:
                 return getattr(self.__object__, item)
-        except:
-            pass
+            except AttributeError:
+                pass
         raise AttributeError("'object' has no attribute " + repr(item))
 
     def __setattr__(self, key, value):
-        try:
-            if key in self.SLOTS:
-                # Value belongs to this class
-                return super().__setattr__(key, value)
+        if key in type(self).SLOTS_SET:
+            # Value belongs to this class
+            return super().__setattr__(key, value)
 
-            elif self.__proxy__:
+        try:
+            proxy = self.__proxy__
+            if proxy:
                 # Value belongs int the proxy
-                self.__proxy__[key] = value
+                proxy[key] = value
 
                 # If setting a property set the property value in the separate process
                 self._call_in_process(self.__loop__, self, '__setattr__', key, value)
@@ -244,7 +482,7 @@ class Proxy(object):
                 # Object exists in a different process
                 setattr(self.__object__, key, value)
                 return
-        except:
+        except (AttributeError, KeyError):
             pass
 
         return super().__setattr__(key, value)
@@ -257,59 +495,90 @@ class Proxy(object):
         state = {'__cache_id__': self.__cache_id__,
                  '__loop_id__': self.__loop_id__,
                  '__proxy_id__': self.__proxy_id__,
-                 '__args__': self.__args__,
-                 '__kwargs__': self.__kwargs__,
                  'is_other_process': is_target_other_process,
-                 'SLOTS': self.SLOTS,
                  }
 
+        cls = type(self)
         if is_target_other_process:
-            # May need to set the initial PROPERTIES and GETTERS value
-            state['PROPERTIES'] = {name: None for name in self.PROPERTIES}
-            state['GETTERS'] = {name: None for name in self.GETTERS}
+            # Only send what the other process cannot get from the class to create the object the first time
+            if self.__args__:
+                state['__args__'] = self.__args__
+            if self.__kwargs__:
+                state['__kwargs__'] = self.__kwargs__
+            if self.PROPERTIES != cls.PROPERTIES or self.GETTERS != cls.GETTERS:
+                state['PROPERTIES'] = list(self.PROPERTIES)
+                state['GETTERS'] = list(self.GETTERS)
         else:
             # May be the best way to sync values? or use event?
-            state['PROPERTIES'] = {name: getattr(self.__object__, name, None) for name in self.PROPERTIES}
-            state['GETTERS'] = {name: _get_getter_value(getattr(self.__object__, name, None)) for name in self.GETTERS}
+            obj = self.__object__
+            store = SharedArray.store
+            properties = tuple(store(getattr(obj, name, None)) for name in self.PROPERTIES)
+            getters = tuple(store(_get_getter_value(getattr(obj, name, None))) for name in self.GETTERS)
+
+            # The main process knows the names from the class. Only send the names if they are different.
+            if self.PROPERTIES != cls.PROPERTIES or self.GETTERS != cls.GETTERS:
+                properties = dict(zip(self.PROPERTIES, properties))
+                getters = dict(zip(self.GETTERS, getters))
+            state['VALUES'] = (properties, getters)
 
         return state
 
     def __setstate__(self, state):
         # Get the loop and cache
-        self.SLOTS = state['SLOTS']
         self.__cache_id__ = state['__cache_id__']
         self.__loop_id__ = state['__loop_id__']
         self.__proxy_id__ = state['__proxy_id__']
+        self.__batch__ = None
         self.__args__ = tuple()
         self.__kwargs__ = {}
         self.__proxy__ = None
         self.__object__ = None
 
-        # Get the cache and loop
-        self.__cache__ = CacheEvent.get_or_register_object(self.__cache_id__, CacheEvent.CACHE)
-        self.__loop__ = CacheEvent.get_or_register_object(self.__loop_id__, None)
+        # Get the cache and loop. Only look them up the first time the ids are seen in this process
+        try:
+            cache = _LOCAL_CACHE[self.__cache_id__]
+        except KeyError:
+            cache = CacheEvent.get_or_register_object(self.__cache_id__, CacheEvent.CACHE)
+            _LOCAL_CACHE[self.__cache_id__] = cache
+        loop = _LOCAL_LOOPS.get(self.__loop_id__, None)
+        if loop is None:
+            # The loop is not registered in the event process. Look it up again, because it may be registered later
+            loop = CacheEvent.get_or_register_object(self.__loop_id__, None)
+            if loop is not None:
+                _LOCAL_LOOPS[self.__loop_id__] = loop
+        self.__cache__ = cache
+        self.__loop__ = loop
 
         # Get if this item is a proxy or real object in a different process
         proxy = self.__cache__.get(self.__proxy_id__, None)
         if state.get('is_other_process', False):
             if not proxy:
                 # ===== Create the new object (One Time!) =====
-                # Set the properties and getters once
-                self.PROPERTIES = list(state.get('PROPERTIES', {}))
-                self.GETTERS = list(state.get("GETTERS", {}))
+                # Set the properties and getters once if they are different from the class
+                if 'PROPERTIES' in state:
+                    self.PROPERTIES = state['PROPERTIES']
+                    self.GETTERS = state['GETTERS']
 
                 # Create the new object in this different process
-                proxy = self.create_mp_object(*state['__args__'], **state['__kwargs__'])
+                proxy = self.create_mp_object(*state.get('__args__', ()), **state.get('__kwargs__', {}))
                 CacheEvent.register_object(proxy, cache=self.__cache__)
                 self.__cache__[self.__proxy_id__] = proxy
 
             self.__object__ = proxy
         else:
             # Re-sync proxy attributes when this object is return to the main process
-            for key, val in state.get('PROPERTIES', {}).items():
-                proxy[key] = val
+            properties, getters = state.get('VALUES', ({}, {}))
+            if isinstance(properties, tuple):
+                properties = zip(self.PROPERTIES, properties)
+                getters = zip(self.GETTERS, getters)
+            else:
+                properties = properties.items()
+                getters = getters.items()
+
+            for key, val in properties:
+                proxy[key] = _load_value(val)
 
-            for key, val in state.get('GETTERS', {}).items():
-                proxy[key] = val
+            for key, val in getters:
+                proxy[key] = _load_value(val)
 
             self.__proxy__ = proxy
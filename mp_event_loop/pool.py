@@ -1,5 +1,16 @@
-import atexit
+import os
+import random
+import itertools
+import multiprocessing as mp
+
+from .events import Event
 from .event_loop import EventLoop
+from .mp_functions import SHARED_MEMORY_SIZE, wake_loop, PickledEvents
+
+try:
+    ForkProcess = mp.get_context('fork').Process
+except ValueError:
+    ForkProcess = None  # Windows cannot fork
 
 
 __all__ = ['Pool']
@@ -10,8 +21,14 @@ class Pool(EventLoop):
 
     EVENT_LOOP = EventLoop
 
+    drain_size = 1  # The processes share the event queue. Get one event at a time to keep all processes working
+    shared_memory_size = SHARED_MEMORY_SIZE  # put_events sends pickled events this large through shared memory
+    shard_queue_class = None  # Queue class for shard_queues. Each shard has one reader, so FastQueue works well
+    map_chunksize = 64  # Number of events map puts on the queue together when the length of iter_args is unknown
+
     def __init__(self, processes=1, output_handlers=None, event_queue=None, consumer_queue=None,
-                 initialize_process=None, name='main', has_results=True):
+                 initialize_process=None, name='main', has_results=True, shard_queues=False, use_fork=False,
+                 affinity=False, max_queue_size=0):
         """Create the event loop.
 
         Args:
@@ -24,32 +41,186 @@ class Pool(EventLoop):
             name (str)['main']: Event loop name. This name is passed to the event process and consumer process.
             has_results (bool)[True]: Should this event loop create a consumer process to run executed events
                 through process_output.
+            shard_queues (bool)[False]: Give each process it's own event queue, so the processes do not compete for
+                one queue. Events with the same event_key always run in the same process. Events without an
+                event_key go to the shorter of the next queue in order and a random queue.
+            use_fork (bool)[False]: Fork the event processes even if the default start method is spawn. The processes
+                share this process's memory (CacheEvent.CACHE, module constants) copy-on-write instead of importing
+                and pickling it again. Ignored on platforms that cannot fork.
+            affinity (bool)[False]: Pin each event process to a different CPU, so the processes are not moved between
+                cores. Ignored if the platform does not support it.
+            max_queue_size (int)[0]: Maximum number of items (events or chunks of events from map) waiting on each
+                event queue that this pool creates. Putting an item on a full queue blocks until a process takes one,
+                so a large map does not get far ahead of the processes. If 0 the queues are unbounded. The queue classes
+                must accept a maxsize keyword (see create_queue).
         """
         self.processes = processes
-        self.loops = []
+        self.use_fork = use_fork
+        self.affinity = affinity
+        if event_queue is None and max_queue_size:
+            event_queue = self.create_queue(self.queue_class, max_queue_size)
+        self.event_processes = []  # [(process, event queue)]
+        self.event_queues = []
+        self._next_queue = 0
         super().__init__(output_handlers=output_handlers, event_queue=event_queue, consumer_queue=consumer_queue,
                          initialize_process=initialize_process, name=name, has_results=has_results)
 
+        if shard_queues:
+            queue_class = self.shard_queue_class or self.queue_class
+            if max_queue_size:
+                self.event_queues = [self.create_queue(queue_class, max_queue_size) for _ in range(self.processes)]
+            else:
+                self.event_queues = [queue_class() for _ in range(self.processes)]
+
+    @staticmethod
+    def create_queue(queue_class, maxsize):
+        """Return a new queue that holds at most maxsize items.
+
+        The bound is passed as the maxsize keyword (multiprocessing.JoinableQueue, FastQueue), because the first
+        argument of some queues is not the number of items (FastQueue's first argument is the buffer size in bytes).
+
+        Args:
+            queue_class (type): Queue class to create.
+            maxsize (int): Maximum number of items on the queue.
+        """
+        try:
+            return queue_class(maxsize=maxsize)
+        except TypeError as err:
+            raise ValueError('max_queue_size cannot be used with {}. The queue class needs a maxsize keyword argument '
+                             'for the number of items.'.format(getattr(queue_class, '__name__', queue_class))) from err
+
+    def put_event(self, event):
+        """Put the event on the event queue to be run in a separate process.
+
+        If the queues are sharded the event_key picks the queue, so events with the same key run in order.
+
+        Args:
+            event (Event): Event to run in a separate process.
+        """
+        if not self.event_queues:
+            return super().put_event(event)
+        elif self._pending:
+            self.flush_events()
+
+        event_key = getattr(event, 'event_key', None)
+        if event_key is None:
+            index = self._next_queue_index()
+        else:
+            index = hash(event_key) % len(self.event_queues)
+        self.event_queues[index].put(self.pack_event(event))
+
+    def _next_queue_index(self):
+        """Return the sharded queue index for events without an event_key.
+
+        The next queue in order is compared with a random queue and the queue with fewer items is used, so a process
+        that is stuck on a slow event is not given more events.
+        """
+        index = self._next_queue
+        self._next_queue = (index + 1) % len(self.event_queues)
+
+        other = random.randrange(len(self.event_queues))
+        try:
+            if self.event_queues[other].qsize() < self.event_queues[index].qsize():
+                return other
+        except (NotImplementedError, AttributeError):
+            pass
+        return index
+
+    def put_events(self, events):
+        """Put several events on the event queue as one item, so they are pickled once and sent together.
+
+        The events are pickled in this process with PickledEvents. Large pickled events are sent through shared memory
+        instead of the queue pipe (see shared_memory_size).
+
+        If the queues are sharded the events are grouped by the queue that their event_key picks. Events without an
+        event_key go to the next queue together.
+
+        Args:
+            events (list/tuple): Events to run in a separate process.
+        """
+        events = list(events)
+        if len(events) <= 1 or not self.batch_events or not self.event_queues:
+            return super().put_events(events)
+        elif self._pending:
+            self.flush_events()
+
+        next_index = self._next_queue_index()
+
+        groups = {}
+        for event in events:
+            event_key = getattr(event, 'event_key', None)
+            if event_key is None:
+                index = next_index
+            else:
+                index = hash(event_key) % len(self.event_queues)
+            groups.setdefault(index, []).append(event)
+
+        for index, group in groups.items():
+            if len(group) > 1:
+                self.event_queues[index].put(PickledEvents.store(group, self.shared_memory_size))
+            else:
+                self.event_queues[index].put(self.pack_event(group[0]))
+
     def start_event_loop(self):
         """Start running the event loop."""
         # Signal that the process is alive
         self.alive_event.set()
 
+        kwargs = self.get_event_loop_kwargs()
+        if self.event_queues:
+            kwargs['drain_size'] = self.EVENT_LOOP.drain_size
+
+        process_class = self.event_loop_class
+        if self.use_fork and ForkProcess is not None:
+            process_class = ForkProcess
+
+        cpus = None
+        if self.affinity:
+            try:
+                cpus = sorted(os.sched_getaffinity(0))
+            except AttributeError:
+                cpus = list(range(os.cpu_count() or 1))
+
         # Create multiple processes
         for i in range(self.processes):
-            el = self.EVENT_LOOP(name=self.name + '_' + str(i), has_results=False,
-                                 event_queue=self.event_queue, consumer_queue=self.consumer_queue,
-                                 initialize_process=self.initialize_process)
-            el.alive_event = self.alive_event
-            el.start_event_loop()
-            self.loops.append(el)
+            if self.event_queues:
+                event_queue = self.event_queues[i]
+            else:
+                event_queue = self.event_queue
+
+            if cpus:
+                kwargs = dict(kwargs, cpu_affinity=[cpus[i % len(cpus)]])
+
+            process = process_class(name='EventLoop-' + self.name + '_' + str(i), target=self.EVENT_LOOP.run_event_loop,
+                                    args=(self.alive_event, event_queue, self.consumer_queue), kwargs=kwargs)
+            process.daemon = True
+            process.start()
+            self.event_processes.append((process, event_queue))
+
+    @property
+    def loops(self):
+        """Return the event processes. The pool used to create an EventLoop for each process.
+
+        Warning:
+            The items are now the processes, so use process.is_alive() instead of loop.is_event_process_alive().
+        """
+        return [process for process, _ in self.event_processes]
 
     def is_event_process_alive(self):
         """Return if the event process is alive."""
-        try:
-            return any((loop.is_event_process_alive() for loop in self.loops))
-        except AttributeError:
-            return False
+        return any(process.is_alive() for process, _ in self.event_processes)
+
+    def wait(self):
+        """Wait for the event queues and consumer queue to finish processing."""
+        self.flush_events()
+        if self.event_queues and self.is_event_process_alive():
+            for event_queue in self.event_queues:
+                try:
+                    event_queue.join()
+                except AttributeError:
+                    pass
+
+        super().wait()
 
     def stop(self):
         """Stop running the process.
@@ -59,12 +230,17 @@ class Pool(EventLoop):
         """
         super().stop()
 
-        # Stop all of the event loops
-        for loop in self.loops:
-            loop.stop()
-        self.loops = []
+        # Wake all of the event processes then wait for them to quit
+        for process, event_queue in self.event_processes:
+            wake_loop(event_queue, process)
+        for process, _ in self.event_processes:
+            try:
+                process.join()
+            except Exception:
+                pass
+        self.event_processes = []
 
-    def map(self, func, iter_args, iter_kwargs=None, cache=False):
+    def map(self, func, iter_args, iter_kwargs=None, cache=False, chunksize=None):
         """Map each item (Event/arguments) in the iterator to run in a function in a separate process.
 
         See Also:
@@ -73,26 +249,51 @@ class Pool(EventLoop):
         Args:
             func (callable): Function to call in a separate process.
             iter_args (iterable/list/tuple/iter): Iterator of positional arguments to pass into the function (add_event)
-            iter_kwargs (iterable/list/tuple/iter): Iterator of dictionary keyword arguments
+                A tuple or list item is several arguments. Any other item is a single argument.
+            iter_kwargs (iterable/list/tuple/iter)[None]: Iterator of dictionary keyword arguments
             cache (bool) [False]: If the target object should be cached
+            chunksize (int)[None]: Number of events to put on the queue together. By default the events are split into
+                about 4 chunks per process if the length of iter_args is known, otherwise map_chunksize is used.
         """
+        if chunksize is None:
+            try:
+                chunksize = max(1, len(iter_args) // (self.processes * 4))
+            except TypeError:
+                chunksize = self.map_chunksize
+
+        create_event = self.create_event
+        cache_kwargs = {'cache': cache}  # create_event unpacks the keyword arguments, so one dict can be reused
+        if not cache and iter_kwargs is None and not isinstance(func, Event) and \
+                type(self).create_event is EventLoop.create_event:
+            # Plain events. Skip the create_event keyword handling for every item
+            create_event = Event
+            cache_kwargs = {}
+
         if iter_kwargs is None:
-            iter_kwargs = [{}] * len(iter_args)
+            iter_kwargs = itertools.repeat(None)
+        else:
+            iter_kwargs = itertools.chain(iter_kwargs, itertools.repeat(None))
 
-        for i, args in enumerate(iter_args):
-            try:
-                kwargs = iter_kwargs[i]
-            except (IndexError, TypeError):
-                kwargs = {}
+        put_events = self.put_events
+        events = []
+        append = events.append
+        for args, kwargs in zip(iter_args, iter_kwargs):
+            if not kwargs:
+                kwargs = cache_kwargs
+            elif 'cache' not in kwargs:
+                kwargs = dict(kwargs, cache=cache)
 
-            if 'cache' not in kwargs:
-                kwargs['cache'] = cache
-            try:
-                iter(args)
-                self.add_event(func, *args, **kwargs)
-            except TypeError:
-                self.add_event(func, args, **kwargs)
+            if isinstance(args, (tuple, list)):
+                append(create_event(func, *args, **kwargs))
+            else:
+                append(create_event(func, args, **kwargs))
 
-        self.wait()
+            if len(events) >= chunksize:
+                put_events(events)
+                events = []
+                append = events.append
 
+        if events:
+            put_events(events)
 
+        self.wait()
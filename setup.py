@@ -95,7 +95,8 @@ if __name__ == "__main__":
           install_requires=[
               ],
           extras_require={
-              'all': ['psutil'],
+              'all': ['psutil', 'faster-fifo'],
+              'fast': ['faster-fifo'],
               },
 
           # entry_points={
@@ -8,6 +8,19 @@ def plus_one(value):
     return value + 1
 
 
+class PickleCount(object):
+    """Count how many times the main process pickles this object."""
+    count = 0
+
+    def __getstate__(self):
+        PickleCount.count += 1
+        return {}
+
+
+def get_pickle_count(obj):
+    return 1
+
+
 def add_vals(value, value2=1):
     return value + value2
 
@@ -118,6 +131,191 @@ def test_event_loop():
         index += 1
 
 
+def test_drain_queue():
+    import queue
+
+    que = queue.Queue()
+    for i in range(10):
+        que.put(i)
+
+    assert mp_event_loop.drain_queue(que, max_items=4) == [0, 1, 2, 3]
+    assert mp_event_loop.drain_queue(que) == [4, 5, 6, 7, 8, 9]
+
+    try:
+        mp_event_loop.drain_queue(que, timeout=0.01)
+        raise AssertionError('drain_queue should raise Empty when no item is available')
+    except queue.Empty:
+        pass
+
+
+def test_output_buffer():
+    import queue
+
+    que = queue.Queue()
+    output = mp_event_loop.OutputBuffer(que, max_items=3, flush_time=60)
+    output.put(1)
+    output.put(2)
+    assert que.empty()
+
+    output.put(3)
+    assert que.get_nowait() == [1, 2, 3]
+
+    output.put(4)
+    output.flush()
+    assert que.get_nowait() == 4
+    assert que.empty()
+
+
+def test_pending_events():
+    results = []
+
+    def save_results(event):
+        results.append(event.results)
+
+    with mp_event_loop.EventLoop(output_handlers=save_results) as loop:
+        loop.pending_size = 10
+        for i in range(25):
+            loop.add_event(plus_one, i)
+        assert len(loop._pending) == 5
+
+        # The held events are put on the queue before an event that is put directly
+        loop.put_event(mp_event_loop.Event(plus_one, 100))
+        assert len(loop._pending) == 0
+
+        # The timer puts the last held event on the queue
+        loop.add_event(plus_one, 200)
+        time.sleep(0.5)
+        assert len(loop._pending) == 0
+        loop.wait()
+
+    assert results == list(range(1, 26)) + [101, 201]
+
+
+def test_use_shm():
+    results = []
+
+    def save_results(event):
+        results.append(event.results)
+
+    with mp_event_loop.EventLoop(output_handlers=save_results) as loop:
+        # Send every event through shared memory
+        loop.use_shm = True
+        loop.shared_memory_size = 0
+        for i in range(10):
+            loop.add_event(len, bytearray(i))
+
+    assert results == list(range(10))
+
+    # Events below shared_memory_size are pickled once and sent as the pickled bytes
+    results.clear()
+    PickleCount.count = 0
+    with mp_event_loop.EventLoop(output_handlers=save_results) as loop:
+        loop.use_shm = True
+        for i in range(10):
+            loop.add_event(get_pickle_count, PickleCount())
+
+    assert results == [1] * 10
+    assert PickleCount.count == 10
+
+
+def test_pickled_events():
+    import pickle
+    from multiprocessing import Pipe
+    from mp_event_loop.mp_functions import shared_memory
+    if shared_memory is None:
+        print('shared_memory is not available. Skipping PickledEvents test')
+        return
+
+    # Small events are sent as the pickled bytes, and large events through shared memory. None never uses shared memory
+    events = [mp_event_loop.Event(len, pickle.PickleBuffer(bytearray(b'abc'))), mp_event_loop.Event(plus_one, 1)]
+    for size in (None, 1 << 20, 0):
+        pickled = mp_event_loop.PickledEvents.store(events, shared_memory_size=size)
+        assert isinstance(pickled, mp_event_loop.PickledEvents)
+        assert (pickled.name is None) == (size != 0)
+        assert pickled.name is not None or len(pickled.buffers) == 1  # The PickleBuffer is out-of-band
+        loaded = pickle.loads(pickle.dumps(pickled))
+        assert type(loaded) is list
+        assert [event.run() for event in loaded] == [3, 2]
+
+    # Connections use the multiprocessing reducers
+    reader, writer = Pipe(duplex=False)
+    pickled = mp_event_loop.PickledEvents.store([mp_event_loop.Event(len, [writer])], shared_memory_size=0)
+    assert isinstance(pickled, mp_event_loop.PickledEvents)
+    assert pickle.loads(pickle.dumps(pickled))[0].run() == 1
+    reader.close()
+    writer.close()
+
+    # Events that cannot be pickled are left for the queue to pickle
+    events = [mp_event_loop.Event(lambda: 1)]
+    assert mp_event_loop.PickledEvents.store(events, shared_memory_size=0) == events
+
+
+def test_pickled_events_freed_at_exit():
+    import os
+    import sys
+    import subprocess
+    from mp_event_loop.mp_functions import shared_memory
+    if shared_memory is None or not os.path.isdir('/dev/shm'):
+        print('POSIX shared memory is not available. Skipping PickledEvents exit test')
+        return
+
+    # Pickled events that are never loaded are freed by the resource tracker when the process exits
+    code = 'import mp_event_loop\n' \
+           'print(mp_event_loop.PickledEvents.store([mp_event_loop.Event(len, b"abc")], 0).name)'
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    name = subprocess.run([sys.executable, '-c', code], cwd=cwd, capture_output=True, text=True,
+                          check=True).stdout.strip()
+    path = os.path.join('/dev/shm', name.lstrip('/'))
+    for _ in range(50):
+        if not os.path.exists(path):
+            break
+        time.sleep(0.1)
+    assert name and not os.path.exists(path)
+
+
+def test_fast_queue():
+    from mp_event_loop.fast_queue import FastQueue, faster_fifo
+    if faster_fifo is None:
+        print('faster_fifo is not installed. Skipping FastQueue test')
+        return
+
+    results = []
+
+    def save_results(event):
+        results.append(event.results)
+
+    with mp_event_loop.EventLoop(event_queue=FastQueue(), consumer_queue=FastQueue(),
+                                 output_handlers=save_results) as loop:
+        for i in range(100):
+            loop.add_event(plus_one, i)
+
+    assert results == list(range(1, 101))
+
+
+def test_fast_queue_full():
+    import threading
+    from mp_event_loop.fast_queue import FastQueue, faster_fifo
+    if faster_fifo is None:
+        print('faster_fifo is not installed. Skipping FastQueue test')
+        return
+
+    # put waits for space without holding the task_done condition
+    que = FastQueue(1000)
+    que.put(bytes(600))
+    th = threading.Thread(target=que.put, args=(bytes(600),), daemon=True)
+    th.start()
+    time.sleep(0.1)
+
+    assert len(que.get(timeout=1)) == 600
+    que.task_done()
+    th.join(5)
+    assert not th.is_alive()
+
+    assert [len(item) for item in que.get_many(timeout=1)] == [600]
+    que.task_done()
+    que.join()
+
+
 if __name__ == '__main__':
     import timeit
 
@@ -128,6 +326,14 @@ if __name__ == '__main__':
     test_event_loop()
     test_concurrency()
     test_global_loop()
+    test_drain_queue()
+    test_output_buffer()
+    test_pending_events()
+    test_use_shm()
+    test_pickled_events()
+    test_pickled_events_freed_at_exit()
+    test_fast_queue()
+    test_fast_queue_full()
 
     # tm = timeit.timeit(test_event_loop, number=20)
     # print(tm)
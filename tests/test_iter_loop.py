@@ -1,11 +1,15 @@
 import multiprocessing as mp
 import mp_event_loop
-from mp_event_loop.iter_event_loop import IterEventLoop
+from mp_event_loop.iter_event_loop import IterEventLoop, IterPool
+
+
+PRINT_ITEMS = False  # Print every item in the event process. Printing slows the event loops down
 
 
 def my_gen(name, value):
     for i in range(value):
-        print(name, i)
+        if PRINT_ITEMS:
+            print(name, i)
         yield i
 
 
@@ -27,30 +31,27 @@ class MyIter(object):
         self.index -= 1
         if self.index <= -1:
             raise StopIteration
-        print(self.name, val)
+        if PRINT_ITEMS:
+            print(self.name, val)
         return val
 
 
 def test_iterator():
-    records = [None] * 200 * 3 * 200 * 3
-    record_idx = [0]
+    records = []
 
     out_queue = mp.JoinableQueue()
 
     def save_record(event):
-        records[record_idx[0]] = event.results
-        record_idx[0] += 1
+        records.append(event.results)
 
     with IterEventLoop(name="EL 1", consumer_queue=out_queue, output_handlers=save_record) as el1,\
             IterEventLoop(name='EL two', consumer_queue=out_queue, has_results=False) as el2,\
             IterEventLoop(name='EL three', consumer_queue=out_queue, has_results=False) as el3:
 
-        # Fast iterator to quickly add all of the events.
-        all((el1.add_event(MyIter('EL 1 - %d iter' % i, 20)),
-             el2.add_event(MyIter('EL two - %d iter' % i, 20)),
-             el3.add_event(MyIter, args=('EL three - %d iter' % i, 20)),
-             )
-            for i in range(5))
+        for i in range(5):
+            el1.add_event(MyIter('EL 1 - %d iter' % i, 20))
+            el2.add_event(MyIter('EL two - %d iter' % i, 20))
+            el3.add_event(MyIter, args=('EL three - %d iter' % i, 20))
 
         print('exit the context')
 
@@ -62,25 +63,21 @@ def test_iterator():
 
 
 def test_generators():
-    records = [None] * 200 * 3 * 200 * 3
-    record_idx = [0]
+    records = []
 
     out_queue = mp.JoinableQueue()
 
     def save_record(event):
-        records[record_idx[0]] = event.results
-        record_idx[0] += 1
+        records.append(event.results)
 
     with IterEventLoop(name="EL 1", consumer_queue=out_queue, output_handlers=save_record) as el1,\
             IterEventLoop(name='EL two', consumer_queue=out_queue, has_results=False) as el2,\
             IterEventLoop(name='EL three', consumer_queue=out_queue, has_results=False) as el3:
 
-        # Fast iterator to quickly add all of the events.
-        all((el1.add_event(iter(my_gen('EL 1 - %d iter' % i, 20))),
-             el2.add_event(my_gen('EL two - %d iter' % i, 20)),
-             # el3.add_event(my, args=('EL three - %d iter' % i, 20)),
-             )
-            for i in range(5))
+        for i in range(5):
+            el1.add_event(iter(my_gen('EL 1 - %d iter' % i, 20)))
+            el2.add_event(my_gen('EL two - %d iter' % i, 20))
+            # el3.add_event(my, args=('EL three - %d iter' % i, 20))
 
         print('exit the context')
 
@@ -91,8 +88,37 @@ def test_generators():
     print("Success! The event loops worked concurrently")
 
 
+def test_fast_pipe():
+    results = []
+
+    def save_record(event):
+        results.append(event.results)
+
+    with IterEventLoop(output_handlers=save_record, fast_pipe=True) as el:
+        for i in range(4):
+            el.add_event(MyIter('Pipe - %d iter' % i, 5))
+
+    assert sorted(results) == sorted(list(range(5, 0, -1)) * 4)
+
+
+def test_iter_pool():
+    results = []
+
+    def save_record(event):
+        results.append(event.results)
+
+    with IterPool(2, output_handlers=save_record, shard_queues=True) as pool:
+        for i in range(4):
+            pool.add_event(MyIter('Pool - %d iter' % i, 5))
+
+    assert len(results) == 4 * 5, results
+    assert sorted(results) == sorted(list(range(5, 0, -1)) * 4)
+
+
 if __name__ == '__main__':
     test_iterator()
+    test_fast_pipe()
+    test_iter_pool()
     # test_generators()  # Generators cannot be pickled
 
     print("All tests ran successfully!")
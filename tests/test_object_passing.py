@@ -1,6 +1,8 @@
 """
 Check how objects with continuous operations work.
 """
+import pickle
+import functools
 
 import mp_event_loop
 
@@ -18,6 +20,65 @@ class ABC(object):
         return "ABC(a=%d, b=%d, c=%d)" % (self.a, self.b, self.c)
 
 
+class Methods(object):
+    def __init__(self, value=1):
+        self.value = value
+
+    def get_value(self, add=0):
+        return self.value + add
+
+    @staticmethod
+    def double(value):
+        return value * 2
+
+    @classmethod
+    def class_name(cls):
+        return cls.__name__
+
+
+class SlotsValue(object):
+    __slots__ = ('value',)
+
+    def __init__(self, value=1):
+        self.value = value
+
+    def get_value(self, add=0):
+        return self.value + add
+
+
+def run_pickled(event):
+    """Pickle round trip the event like the queue does and return the results of running it."""
+    event = pickle.loads(pickle.dumps(event))
+    event.exec_()
+    assert event.error is None, event.error
+    return event.results
+
+
+def test_cache_event_methods():
+    # Bound method found from the class. The bound method is only created if the target is read
+    obj = Methods(1)
+    event = pickle.loads(pickle.dumps(mp_event_loop.CacheEvent(obj.get_value, 2)))
+    event.exec_()
+    assert event.results == 3
+    assert event._target is None
+    assert event.target.__func__ is Methods.get_value
+
+    # Static method and class method
+    assert run_pickled(mp_event_loop.CacheEvent(obj.double, 4)) == 8
+    assert run_pickled(mp_event_loop.CacheEvent(Methods.double, 5)) == 10
+    assert run_pickled(mp_event_loop.CacheEvent(obj.class_name)) == 'Methods'
+    assert run_pickled(mp_event_loop.CacheEvent(Methods.class_name)) == 'Methods'
+
+    # An instance attribute overrides the class method
+    obj = Methods(1)
+    event = mp_event_loop.CacheEvent(obj.get_value, 3)
+    obj.get_value = functools.partial(pow, 2)
+    assert run_pickled(event) == 8
+
+    # Objects without a __dict__
+    assert run_pickled(mp_event_loop.CacheEvent(SlotsValue(5).get_value, 1)) == 6
+
+
 def test_object_state():
     # with mp_event_loop.get_event_loop() as loop:
     #     loop.add_event(print, 'hello world!')
@@ -80,5 +141,6 @@ def test_cache_object():
 
 
 if __name__ == '__main__':
+    test_cache_event_methods()
     # test_object_state()
     test_cache_object()
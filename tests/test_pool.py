@@ -1,3 +1,5 @@
+import pickle
+
 import mp_event_loop
 
 
@@ -5,6 +7,19 @@ def get_proc(a, b):
     return a + b
 
 
+class PickleCount(object):
+    """Count how many times the main process pickles this object."""
+    count = 0
+
+    def __getstate__(self):
+        PickleCount.count += 1
+        return {}
+
+
+def get_pickle_count(obj):
+    return 1
+
+
 def test_pool():
     results = []
 
@@ -44,6 +59,129 @@ def test_pool_map():
     # print("Pool stopped")
 
 
+def test_pool_map_chunks():
+    results = []
+
+    def save_results(event):
+        results.append(event.results)
+
+    with mp_event_loop.Pool(processes=2, output_handlers=save_results) as pool:
+        # A generator has no length, so the chunksize is given
+        pool.map(get_proc, ((i, 1) for i in range(20)), chunksize=5)
+        assert sorted(results) == list(range(1, 21))
+
+        results.clear()
+        pool.map(get_proc, [(i,) for i in range(20)], iter_kwargs=({'b': 2} for _ in range(20)))
+        assert sorted(results) == list(range(2, 22))
+
+
+def test_pool_map_shared_memory():
+    results = []
+
+    def save_results(event):
+        results.append(event.results)
+
+    with mp_event_loop.Pool(processes=2, output_handlers=save_results) as pool:
+        # Send every chunk through shared memory
+        pool.shared_memory_size = 0
+        pool.map(len, [(b'a' * i,) for i in range(20)], chunksize=5)
+        assert sorted(results) == list(range(20))
+
+        # PickleBuffers (like numpy arrays) are pickled out-of-band and copied into shared memory separately
+        results.clear()
+        pool.map(len, [(pickle.PickleBuffer(bytearray(i)),) for i in range(20)], chunksize=5)
+        assert sorted(results) == list(range(20))
+
+
+def test_pool_map_pickle_once():
+    results = []
+
+    def save_results(event):
+        results.append(event.results)
+
+    # Each chunk is pickled once. The queue puts the pickled bytes without pickling the events again
+    PickleCount.count = 0
+    with mp_event_loop.Pool(processes=2, output_handlers=save_results) as pool:
+        pool.map(get_pickle_count, [(PickleCount(),) for _ in range(16)], chunksize=4)
+        assert sum(results) == 16
+    assert PickleCount.count == 16
+
+
+def test_pool_max_queue_size():
+    results = []
+
+    def save_results(event):
+        results.append(event.results)
+
+    with mp_event_loop.Pool(processes=2, output_handlers=save_results, max_queue_size=2) as pool:
+        pool.map(get_proc, ((i, 1) for i in range(100)), chunksize=4)
+        assert sorted(results) == list(range(1, 101))
+
+
+def test_pool_shard_max_queue_size():
+    from mp_event_loop.fast_queue import FastQueue, PipeQueue, faster_fifo
+    if faster_fifo is None:
+        print('faster_fifo is not installed. Skipping sharded FastQueue test')
+        return
+
+    class FastPool(mp_event_loop.Pool):
+        shard_queue_class = FastQueue
+
+    results = []
+
+    def save_results(event):
+        results.append(event.results)
+
+    # max_queue_size is the number of items, not the FastQueue buffer size in bytes
+    with FastPool(processes=2, output_handlers=save_results, shard_queues=True, max_queue_size=4) as pool:
+        for i in range(20):
+            pool.add_event(get_proc, i, 1, event_key=i % 3)
+        pool.wait()
+    assert sorted(results) == list(range(1, 21))
+
+    class PipePool(mp_event_loop.Pool):
+        shard_queue_class = PipeQueue
+
+    try:
+        PipePool(processes=2, shard_queues=True, max_queue_size=4)
+        raise AssertionError('PipeQueue does not support max_queue_size')
+    except ValueError:
+        pass
+
+
+def test_pool_use_fork():
+    results = []
+
+    def save_results(event):
+        results.append(event.results)
+
+    with mp_event_loop.Pool(processes=2, output_handlers=save_results, use_fork=True) as pool:
+        assert len(pool.loops) == 2
+        pool.map(get_proc, [(i, 1) for i in range(10)])
+        assert sorted(results) == list(range(1, 11))
+
+
+def test_pool_shard_queues():
+    results = []
+
+    def save_results(event):
+        results.append((event.event_key, event.results))
+
+    with mp_event_loop.Pool(4, output_handlers=save_results, shard_queues=True) as pool:
+        assert len(pool.event_queues) == 4
+        for i in range(10):
+            pool.add_event(get_proc, i, 1, event_key='a')
+        for i in range(10):
+            pool.add_event(get_proc, i, 2)
+        pool.wait()
+
+    assert len(results) == 20, results
+
+    # Events with the same event_key run in the same process in order
+    assert [value for key, value in results if key == 'a'] == list(range(1, 11))
+    assert sorted(value for key, value in results if key is None) == list(range(2, 12))
+
+
 class MpPoint(mp_event_loop.Proxy):
     # Pass the attributes down to the separate process
     PROPERTIES = ['x', 'y']
@@ -95,5 +233,12 @@ def test_pool_cache():
 if __name__ == '__main__':
     test_pool()
     test_pool_map()
+    test_pool_map_chunks()
+    test_pool_map_shared_memory()
+    test_pool_map_pickle_once()
+    test_pool_max_queue_size()
+    test_pool_shard_max_queue_size()
+    test_pool_use_fork()
+    test_pool_shard_queues()
     test_pool_cache()
     print("All tests passed successfully!")
@@ -45,6 +45,25 @@ class PointProxy(mp_event_loop.Proxy):
         self._z = z
 
 
+class Signal(object):
+    def __init__(self, size=0):
+        import numpy as np
+        self.data = np.zeros(size)
+
+    def fill(self, value):
+        self.data[:] = value
+
+
+class SignalProxy(mp_event_loop.Proxy):
+    PROXY_CLASS = Signal
+    PROPERTIES = ['data']
+
+
+class QuietPointProxy(mp_event_loop.Proxy):
+    # Nothing to sync, so the calls do not send output back
+    PROXY_CLASS = Point
+
+
 def test_proxy():
     with mp_event_loop.EventLoop() as loop:
         p = PointProxy(loop=loop)
@@ -84,9 +103,9 @@ def test_proxy_wait():
     with mp_event_loop.EventLoop() as loop:
         p = PointProxy(2, 3, loop=loop)
         p.move(1, 2)
-        t = time.clock()
+        t = time.perf_counter_ns()
         p.mp_wait()
-        print("Wait time:", time.clock() - t)  # Slow!!!!! I'm in a GUI, so I don't really care
+        print("Wait time:", (time.perf_counter_ns() - t) / 1e6, "ms")  # Slow!!!!! I'm in a GUI, so I don't really care
         assert p.x == 1
         assert p.y == 2
 
@@ -94,6 +113,77 @@ def test_proxy_wait():
     assert p.y == 2
 
 
+def test_proxy_wait_iter_loop():
+    from mp_event_loop.iter_event_loop import IterEventLoop
+
+    # Events without output must still be marked done, so mp_wait returns
+    with IterEventLoop() as loop:
+        p = QuietPointProxy(2, 3, loop=loop)
+        p.move(1, 2)
+        p.mp_wait()
+
+
+def local_cache_size():
+    from mp_event_loop import mp_proxy
+    return len(mp_proxy._LOCAL_CACHE)
+
+
+def test_proxy_local_cache():
+    results = []
+
+    def save_results(event):
+        if event.event_key == 'local_cache_size':
+            results.append(event.results)
+
+    # The event process does not have the loop, but it still saves the cache it found
+    with mp_event_loop.EventLoop() as loop:
+        loop.add_output_handler(save_results)
+        p = PointProxy(loop=loop)
+        p.move(1, 2)
+        p.move(3, 4)
+        loop.add_event(local_cache_size, event_key='local_cache_size')
+
+    assert p.x == 3
+    assert results and results[0] > 0
+
+
+def test_proxy_batch():
+    with mp_event_loop.EventLoop() as loop:
+        p = PointProxy(loop=loop)
+        with p.mp_batch():
+            p.move(1, 2)
+            p.set_z(3)
+            p.x = 4
+        p.mp_wait()
+
+    assert p.x == 4
+    assert p.y == 2
+    assert p.get_z() == 3
+
+
+def test_proxy_batch_nested():
+    with mp_event_loop.EventLoop() as loop:
+        p = PointProxy(loop=loop)
+        with p.mp_batch():
+            p.move(1, 2)
+            with p.mp_batch():
+                p.set_z(3)
+            p.x = 4
+
+        # An error in the context does not send the collected calls
+        try:
+            with p.mp_batch():
+                p.set_z(5)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        p.mp_wait()
+
+    assert p.x == 4
+    assert p.y == 2
+    assert p.get_z() == 3
+
+
 def test_proxy_getter_property_conflict():
     """Show the difference between GETTER and PROPERTY. If you don't sync both there could be differing results."""
     with mp_event_loop.EventLoop() as loop:
@@ -111,10 +201,55 @@ def test_proxy_getter_property_conflict():
     assert p.get_z() == 3
 
 
+def test_proxy_shared_array():
+    from mp_event_loop.mp_proxy import np, shared_memory
+    if np is None or shared_memory is None:
+        print('numpy or shared_memory is not available. Skipping SharedArray test')
+        return
+
+    # Big enough to be synced through shared memory
+    size = mp_event_loop.SHARED_MEMORY_SIZE // 8 + 1
+    with mp_event_loop.EventLoop() as loop:
+        s = SignalProxy(size, loop=loop)
+        s.fill(5)
+
+    assert s.data.shape == (size,)
+    assert (s.data == 5).all()
+
+
+def test_shared_array_freed_at_exit():
+    import os
+    import sys
+    import subprocess
+    from mp_event_loop.mp_proxy import np, shared_memory
+    if np is None or shared_memory is None or not os.path.isdir('/dev/shm'):
+        print('numpy or POSIX shared memory is not available. Skipping SharedArray exit test')
+        return
+
+    # A SharedArray that is never loaded is freed by the resource tracker when the process exits
+    code = 'import numpy as np, mp_event_loop\n' \
+           'print(mp_event_loop.SharedArray.store(np.zeros(mp_event_loop.SHARED_MEMORY_SIZE)).name)'
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    name = subprocess.run([sys.executable, '-c', code], cwd=cwd, capture_output=True, text=True,
+                          check=True).stdout.strip()
+    path = os.path.join('/dev/shm', name.lstrip('/'))
+    for _ in range(50):
+        if not os.path.exists(path):
+            break
+        time.sleep(0.1)
+    assert name and not os.path.exists(path)
+
+
 if __name__ == '__main__':
     test_proxy()
     test_proxy_class_loop()
     test_proxy_alt_args()
     test_proxy_wait()
+    test_proxy_wait_iter_loop()
+    test_proxy_local_cache()
+    test_proxy_batch()
+    test_proxy_batch_nested()
     test_proxy_getter_property_conflict()
+    test_proxy_shared_array()
+    test_shared_array_freed_at_exit()
     print("All tests ran successfully!")